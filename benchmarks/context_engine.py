@@ -0,0 +1,243 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, List, Optional
+
+from vla_star.context_engine.context_engine import OrderedContextLLMEngine
+from vla_star.vla_complex.general_dataset import ToolChoiceMade
+from vla_star.vla_complex.vla_complex import VLA_Complex
+from vla_star.vla_complex.vla_complex_state import State
+
+"""
+Synthetic-load benchmarks for the context engine's hot path.
+
+    python -m benchmarks.context_engine                                   # default grid
+    python -m benchmarks.context_engine --complexes 4 16 --session 100 1000 --impression 10
+    python -m benchmarks.context_engine --compare benchmarks/results/<older>.json
+
+Each scenario builds `complexes` synthetic VLA_Complexes, each with `session` events and an
+impression of `impression` keys, then runs `iterations` rounds of what an identity run does
+before the model is called. Every round one complex gets a new event and one gets an impression
+change, like live traffic. Phases, timed separately:
+
+    pull    - Context pulled from the complexes (context_init)
+    order   - OrderedContext ordering (order_context)
+    render  - JSON rendering (str(ordered_context))
+    write   - ContextEngine.write (journal line + Dataset frame)
+    frame   - Dataset frame emission (write_output)
+
+Results go to benchmarks/results/context_engine@<time>.json. With --compare, phases whose p50
+got more than --threshold times slower than in the older results are reported, and the exit
+code is 1.
+"""
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+PHASES = ("pull", "order", "render", "write", "frame")
+WORDS = "the robot arm picked up placed cup table door open closed left right moving stopped user said hello".split()
+
+
+class SyntheticComplex(VLA_Complex):
+    def __init__(self, tool_name: str, session_length: int, impression_size: int, rng: random.Random):
+        super().__init__(tool_name)
+        self.rng = rng
+        self.state = State(session=[], impression={f"key {i}": self.text(4) for i in range(impression_size)})
+        for _ in range(session_length):
+            self.state.add_to_session(self.rng.choice(("Status", "user", "self")), self.text(12))
+
+    def text(self, words: int) -> str:
+        return " ".join(self.rng.choice(WORDS) for _ in range(words))
+
+    def new_event(self):
+        self.state.add_to_session("Status", self.text(12))
+
+    def new_impression(self):
+        if self.state.impression:
+            self.state.impression[self.rng.choice(list(self.state.impression))] = self.text(4)
+
+    async def execute(self, **kwargs):
+        return f"[Synthetic] {self.tool_name} done."
+
+@dataclass
+class SyntheticTool:
+    name: str
+    tool_dict: dict
+    vla_complex: SyntheticComplex
+
+
+def build_engine(complexes: int, session_length: int, impression_size: int, seed: int) -> OrderedContextLLMEngine:
+    rng = random.Random(seed)
+    tools = []
+    for i in range(complexes):
+        name = f"complex_{i}"
+        tool_dict = {
+            "type": "function",
+            "name": name,
+            "description": f"Synthetic complex {i}",
+            "parameters": {"type": "object", "properties": {"text": {"type": "string"}}, "required": ["text"]},
+        }
+        tools.append(SyntheticTool(name, tool_dict, SyntheticComplex(name, session_length, impression_size, rng)))
+    engine = OrderedContextLLMEngine(
+        f"benchmark_{complexes}x{session_length}x{impression_size}",
+        construction="You are a benchmark.", instructions="", motive="", extra="", recorded=True
+    )
+    engine.attach_tools(tools)
+    engine.instance_system_prompt()
+    return engine
+
+def percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def phase_stats(times: List[float]) -> dict[str, float]:
+    ordered = sorted(times)
+    return {
+        "mean_us": 1e6 * statistics.fmean(ordered),
+        "p50_us": 1e6 * percentile(ordered, 0.50),
+        "p95_us": 1e6 * percentile(ordered, 0.95),
+        "min_us": 1e6 * ordered[0],
+    }
+
+
+def run_scenario(complexes: int, session_length: int, impression_size: int, iterations: int, warmup: int, seed: int) -> dict[str, Any]:
+    with contextlib.redirect_stdout(io.StringIO()): # the engine is chatty
+        engine = build_engine(complexes, session_length, impression_size, seed)
+    synthetic = engine.vla_complexes
+    times = {phase: [] for phase in PHASES}
+    rendered_bytes = 0
+    clock = time.perf_counter
+    for i in range(warmup + iterations):
+        synthetic[i % len(synthetic)].new_event()
+        synthetic[(i * 7 + 3) % len(synthetic)].new_impression()
+
+        t0 = clock()
+        engine.context_init()
+        t1 = clock()
+        engine.order_context()
+        t2 = clock()
+        rendered = str(engine.ordered_context)
+        t3 = clock()
+        engine.write()
+        t4 = clock()
+        engine.write_output(
+            ToolChoiceMade(function={"name": synthetic[0].tool_name, "description": None, "parameters": {"text": "hello"}}),
+            {"model": "synthetic", "name": engine.context_engine_name}
+        )
+        t5 = clock()
+
+        if i < warmup:
+            continue
+        for phase, start, end in zip(PHASES, (t0, t1, t2, t3, t4), (t1, t2, t3, t4, t5)):
+            times[phase].append(end - start)
+        rendered_bytes = len(rendered)
+    engine.journal.close()
+
+    return {
+        "complexes": complexes,
+        "session_length": session_length,
+        "impression_size": impression_size,
+        "iterations": iterations,
+        "rendered_bytes": rendered_bytes,
+        "phases": {phase: phase_stats(phase_times) for phase, phase_times in times.items()},
+        "total_p50_us": sum(phase_stats(phase_times)["p50_us"] for phase_times in times.values()),
+    }
+
+def scenario_key(scenario: dict) -> tuple:
+    return (scenario["complexes"], scenario["session_length"], scenario["impression_size"])
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).resolve().parent,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(complexes: List[int], sessions: List[int], impressions: List[int], iterations: int, warmup: int, seed: int) -> dict[str, Any]:
+    scenarios = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="vla_star_benchmark_") as workdir:
+        os.chdir(workdir) # frozen/ and data/ are relative
+        try:
+            for n in complexes:
+                for length in sessions:
+                    for size in impressions:
+                        scenario = run_scenario(n, length, size, iterations, warmup, seed)
+                        scenarios.append(scenario)
+                        print(
+                            f"[Benchmark] {n} complexes x {length} events, {size} impression keys: "
+                            + ", ".join(f"{phase} {stats['p50_us']:.0f}us" for phase, stats in scenario["phases"].items())
+                        )
+        finally:
+            os.chdir(cwd)
+    return {
+        "benchmark": "context_engine",
+        "timestamp": datetime.now().isoformat(),
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "seed": seed,
+        "scenarios": scenarios,
+    }
+
+def compare(results: dict[str, Any], baseline: dict[str, Any], threshold: float) -> List[str]:
+    """
+    Phases whose p50 went up by more than threshold times, scenario by scenario
+    """
+    regressions = []
+    old = {scenario_key(scenario): scenario for scenario in baseline["scenarios"]}
+    for scenario in results["scenarios"]:
+        before = old.get(scenario_key(scenario))
+        if before is None:
+            continue
+        for phase, stats in scenario["phases"].items():
+            if phase not in before["phases"] or not before["phases"][phase]["p50_us"]:
+                continue
+            ratio = stats["p50_us"] / before["phases"][phase]["p50_us"]
+            if ratio > threshold:
+                regressions.append(
+                    f"{scenario_key(scenario)} {phase}: {before['phases'][phase]['p50_us']:.0f}us -> {stats['p50_us']:.0f}us ({ratio:.2f}x)"
+                )
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the context engine on synthetic VLA_Complexes.")
+    parser.add_argument("--complexes", type=int, nargs="+", default=[4, 16])
+    parser.add_argument("--session", type=int, nargs="+", default=[100, 1000], help="Events per complex.")
+    parser.add_argument("--impression", type=int, nargs="+", default=[10], help="Keys per impression.")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, default=None, help="Defaults to benchmarks/results/context_engine@<time>.json")
+    parser.add_argument("--compare", type=Path, default=None, help="Older results to check for regressions.")
+    parser.add_argument("--threshold", type=float, default=1.2)
+    args = parser.parse_args()
+
+    results = run(args.complexes, args.session, args.impression, args.iterations, args.warmup, args.seed)
+    out = args.out or RESULTS_DIR / f"context_engine@{datetime.now().strftime('%Y-%m-%dT%H-%M-%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"[Benchmark] Saved to {out}")
+
+    if args.compare is not None:
+        with open(args.compare, "r") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"[Benchmark] Regression {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"[Benchmark] No phase slower than {args.threshold}x {args.compare}")
@@ -10,14 +10,14 @@ import io
 import os
 import numpy as np
 import scipy.io.wavfile
-from openai import OpenAI # for tts
-openai_client = OpenAI()
+from vla_star.tool_choice_models import clients # for tts
 import numpy as np
 import asyncio
 from pydub import AudioSegment
 from pydub.playback import play
 from openai import AsyncOpenAI
 from openai.helpers import LocalAudioPlayer
+import vla_star.utilities.metrics as metrics
 
 """
 Functions to extend the chat script to be audio. Realtime is better...
@@ -34,8 +34,10 @@ def text_to_speech(text, voice: str = "coral") -> bytes:
     """
     if text == "":
         return None
-    client = OpenAI()
+    client = clients.sync_client()
 
+    # The speech API doesn't report usage
+    metrics.record({"input_tokens": metrics.estimate_tokens(text)}, "gpt-4o-mini-tts", "tts")
     with client.audio.speech.with_streaming_response.create(
         model="gpt-4o-mini-tts",
         voice=voice,
@@ -73,12 +75,14 @@ def speech_to_text(audio_bytes: bytes):
     audio_file = io.BytesIO(audio_bytes)
     audio_file.name = "input.wav"  # name helps certain client libs
 
-    result = openai_client.audio.transcriptions.create(
+    result = clients.sync_client().audio.transcriptions.create(
         model="gpt-4o-mini-transcribe",
         file=audio_file,
         response_format="text",
         chunking_strategy="auto",
     )
+    # Plain text responses carry no usage: only the transcript's tokens are counted
+    metrics.record({"output_tokens": metrics.estimate_tokens(result)}, "gpt-4o-mini-transcribe", "stt")
     return result.rstrip("\n")
 
 def text_to_speech_generate(text: str):
@@ -87,7 +91,8 @@ def text_to_speech_generate(text: str):
     Returns: (pcm16_bytes, sample_rate)
     """
 
-    response = openai_client.audio.speech.create(
+    metrics.record({"input_tokens": metrics.estimate_tokens(text)}, "gpt-4o-mini-tts", "tts")
+    response = clients.sync_client().audio.speech.create(
         model="gpt-4o-mini-tts",
         voice="alloy",
         input=text,
@@ -11,6 +11,7 @@ import pyaudio
 import threading
 import requests
 import json
+import vla_star.utilities.metrics as metrics
 
 SPEAKER_ID = os.environ.get("SPEAKER_ID", None) # should be a modifier on chat VLA_Complex
 if SPEAKER_ID:
@@ -150,6 +151,7 @@ class RealtimeTranscriber:
                     delta = event.get("delta")
                     print(f"[delta] {delta}", "item:", event.get("item_id"))
                 case "conversation.item.input_audio_transcription.completed":
+                    metrics.record(event.get("usage"), "gpt-4o-transcribe", "stt")
                     text = event.get("transcript", "")
                     if text:
                         print(f"[heard] {text}")
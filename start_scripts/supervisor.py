@@ -0,0 +1,232 @@
+from host.manifest_manager import get_manifest
+
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+"""
+Starts many VLA*s as worker processes, one per agent, spread over the cores.
+
+    python -m start_scripts.supervisor                 # every VLA* in the manifest
+    python -m start_scripts.supervisor Mike Fred --memory-limit 800
+
+Crashed workers are restarted with exponential backoff, workers over the memory limit are
+killed (and restarted), and per-agent CPU, RSS, rerun rate and spend are shown live.
+Stats come from /proc, so they're only shown on Linux.
+"""
+
+BACKOFF_BASE = 1.0     # seconds
+BACKOFF_MAX = 60.0
+STABLE_UPTIME = 60.0   # a worker up this long has its backoff reset
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+AGENT_NOT_FOUND = 2
+# Exit codes a restart can't fix: the worker is retired instead
+NOT_RESTARTED = {0: "stopped cleanly", AGENT_NOT_FOUND: "could not find the agent"}
+
+def run_agent(name: str, core: Optional[int], rerun_count, cost_per_hour):
+    """
+    Worker: what start.py does, plus publishing the ThinkingMachine's rerun count and the agent's spend
+    """
+    if core is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {core})
+
+    from starter.starter import Starter
+    from host.host import Host
+    import vla_star.utilities.metrics as metrics
+
+    vla_star = Starter.try_load_by_name(name)
+    if not vla_star:
+        print(f"[Supervisor] Could not find {name}")
+        sys.exit(AGENT_NOT_FOUND)
+
+    def publish():
+        while True:
+            if vla_star.thinking_machine is not None:
+                rerun_count.value = vla_star.thinking_machine.rerun_count
+            cost_per_hour.value = sum(summary["cost_per_hour"] for summary in metrics.summaries().values())
+            time.sleep(1)
+    threading.Thread(target=publish, daemon=True).start()
+
+    try:
+        Host.list_vla_star(vla_star)
+        Host.sync_manifest()
+    except Exception as e:
+        print(f"[Supervisor] Could not list {name} on the manifest: {e}")
+    vla_star_starter = Starter(vla_star)
+    vla_star_starter.start()
+    vla_star_starter.try_pickle_vla_star()
+    try:
+        Host.update_vla_star_on_list(vla_star)
+        Host.sync_manifest()
+    except Exception as e:
+        print(f"[Supervisor] Could not delist {name} on the manifest: {e}")
+
+
+@dataclass
+class Worker:
+    name: str
+    core: Optional[int]
+    process: Optional[mp.Process] = None
+    rerun_count: object = field(default_factory=lambda: mp.Value("q", 0))
+    cost_per_hour: object = field(default_factory=lambda: mp.Value("d", 0.0)) # USD, over metrics.METRICS_WINDOW
+    started: float = 0.0
+    restarts: int = 0
+    failures: int = 0            # in a row, for the backoff
+    restart_at: Optional[float] = None
+    last_exit: Optional[str] = None
+    retired: bool = False        # exited for good (put to sleep, agent not found): not restarted
+    # for rates
+    last_sample: float = 0.0
+    last_cpu_ticks: Optional[int] = None
+    last_reruns: int = 0
+    cpu: Optional[float] = None  # percent of one core
+    rss_mb: Optional[float] = None
+    rerun_rate: float = 0.0      # per minute
+
+    def start(self):
+        self.rerun_count.value = 0
+        self.cost_per_hour.value = 0.0
+        self.last_reruns = 0
+        self.last_cpu_ticks = None
+        self.process = mp.Process(target=run_agent, args=(self.name, self.core, self.rerun_count, self.cost_per_hour), name=f"vla_star:{self.name}", daemon=False)
+        self.process.start()
+        self.started = time.time()
+        self.restart_at = None
+
+    def sample(self):
+        now = time.time()
+        pid = self.process.pid
+        ticks = cpu_ticks(pid)
+        self.rss_mb = rss_mb(pid)
+        if ticks is not None and self.last_cpu_ticks is not None and now > self.last_sample:
+            self.cpu = 100 * (ticks - self.last_cpu_ticks) / CLOCK_TICKS / (now - self.last_sample)
+        reruns = self.rerun_count.value
+        if self.last_sample and now > self.last_sample:
+            self.rerun_rate = 60 * (reruns - self.last_reruns) / (now - self.last_sample)
+        self.last_cpu_ticks, self.last_reruns, self.last_sample = ticks, reruns, now
+
+
+def cpu_ticks(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return int(fields[11]) + int(fields[12]) # utime + stime
+    except (OSError, IndexError, ValueError):
+        return None
+
+def rss_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE / 2**20
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class Supervisor:
+    def __init__(self, names: List[str], memory_limit_mb: Optional[float] = None, interval: float = 2.0, cores: Optional[int] = None):
+        cores = cores or os.cpu_count() or 1
+        self.workers = [Worker(name, i % cores) for i, name in enumerate(names)]
+        self.memory_limit_mb = memory_limit_mb
+        self.interval = interval
+        self.active = False
+
+    def start(self):
+        print(f"[Supervisor] Starting {len(self.workers)} VLA*s: {[w.name for w in self.workers]}")
+        for worker in self.workers:
+            worker.start()
+        self.active = True
+        try:
+            while self.active:
+                time.sleep(self.interval)
+                self.tick()
+                self.show()
+                if all(worker.retired for worker in self.workers):
+                    print("[Supervisor] Every VLA* has stopped.")
+                    break
+        except KeyboardInterrupt:
+            print("[Supervisor] Stopping workers.")
+        finally:
+            self.stop()
+
+    def tick(self):
+        now = time.time()
+        for worker in self.workers:
+            if worker.retired:
+                continue
+            if worker.restart_at is not None:
+                if now >= worker.restart_at:
+                    worker.restarts += 1
+                    worker.start()
+                continue
+            if not worker.process.is_alive():
+                worker.last_exit = f"exit {worker.process.exitcode}"
+                reason = NOT_RESTARTED.get(worker.process.exitcode)
+                if reason is not None:
+                    print(f"[Supervisor] {worker.name} {reason} (exit {worker.process.exitcode}). Not restarting it.")
+                    worker.retired = True
+                    worker.cpu = worker.rss_mb = None
+                    worker.rerun_rate = 0.0
+                else:
+                    self.schedule_restart(worker, now)
+                continue
+            worker.sample()
+            if self.memory_limit_mb and worker.rss_mb and worker.rss_mb > self.memory_limit_mb:
+                print(f"[Supervisor] {worker.name} is over the memory limit ({worker.rss_mb:.0f} > {self.memory_limit_mb:.0f} MB). Killing.")
+                worker.process.kill()
+                worker.process.join()
+                worker.last_exit = f"memory {worker.rss_mb:.0f} MB"
+                self.schedule_restart(worker, now)
+
+    def schedule_restart(self, worker: Worker, now: float):
+        if now - worker.started >= STABLE_UPTIME:
+            worker.failures = 0
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** worker.failures)
+        worker.failures += 1
+        worker.restart_at = now + delay
+        worker.cpu = worker.rss_mb = None
+        worker.rerun_rate = 0.0
+        print(f"[Supervisor] {worker.name} stopped ({worker.last_exit}). Restarting in {delay:.0f}s.")
+
+    def show(self):
+        lines = [f"{'agent':<20}{'pid':>8}{'core':>6}{'cpu %':>8}{'rss MB':>9}{'reruns/min':>12}{'$/hour':>9}{'restarts':>10}  status"]
+        for w in self.workers:
+            status = "stopped" if w.retired else "restarting" if w.restart_at is not None else "up"
+            lines.append(
+                f"{w.name:<20}{w.process.pid or '-':>8}{w.core if w.core is not None else '-':>6}"
+                f"{fmt(w.cpu):>8}{fmt(w.rss_mb):>9}{w.rerun_rate:>12.1f}{w.cost_per_hour.value:>9.2f}{w.restarts:>10}  {status}"
+                + (f" (last: {w.last_exit})" if w.last_exit else "")
+            )
+        print("\n".join(lines) + "\n")
+
+    def stop(self):
+        self.active = False
+        for worker in self.workers:
+            if worker.process is not None and worker.process.is_alive():
+                worker.process.terminate()
+        for worker in self.workers:
+            if worker.process is not None:
+                worker.process.join(timeout=10)
+
+def fmt(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.1f}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run many VLA*s as supervised worker processes.")
+    parser.add_argument("names", nargs="*", help="VLA*s to start. Defaults to every VLA* in the manifest.")
+    parser.add_argument("--memory-limit", type=float, default=None, help="Per-worker RSS limit in MB.")
+    parser.add_argument("--interval", type=float, default=2.0, help="Seconds between stats.")
+    parser.add_argument("--cores", type=int, default=None, help="Number of cores to spread over.")
+    args = parser.parse_args()
+
+    names = args.names or [vla_star_data["name"] for vla_star_data in get_manifest()]
+    if not names:
+        print("[Supervisor] No VLA*s to start.")
+        sys.exit(1)
+    Supervisor(names, args.memory_limit, args.interval, args.cores).start()
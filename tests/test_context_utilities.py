@@ -0,0 +1,88 @@
+# PYTEST_DISABLE_PLUGIN_AUTOLOAD=1 python -m pytest tests
+
+import sys
+from pathlib import Path
+parent_dir = Path(__file__).resolve().parent
+sys.path.append(str(parent_dir.parent))
+
+import json
+from vla_star.context_engine.context_utilities import Timeline, extract_timestamp
+
+def event(second, label):
+    return {f"[2026-02-07 14:19:{second:02d}] {label}": "data"}
+
+def test_timeline_merges_sessions_in_time():
+    timeline = Timeline()
+    arm = [event(1, "Status"), event(5, "Status")]
+    chat = [event(2, "user"), event(3, "self")]
+    merged = timeline.merge({"arm": arm, "chat": chat})
+    assert merged == [arm[0], chat[0], chat[1], arm[1]]
+
+def test_timeline_only_merges_new_events():
+    timeline = Timeline()
+    arm = [event(1, "Status")]
+    chat = [event(2, "user")]
+    timeline.merge({"arm": arm, "chat": chat})
+    arm.append(event(4, "Status"))
+    chat.append(event(3, "self"))
+    merged = timeline.merge({"arm": arm, "chat": chat})
+    timestamps = [extract_timestamp(e) for e in merged]
+    assert timestamps == sorted(timestamps)
+    assert timeline.event_count == 4
+
+def test_timeline_rereads_replaced_sessions():
+    timeline = Timeline()
+    sessions = {"arm": [event(1, "Status"), event(2, "Status")], "chat": [event(3, "user")]}
+    timeline.merge(sessions)
+    sessions["arm"] = [event(2, "Summary")]
+    assert timeline.merge(sessions) == [event(2, "Summary"), event(3, "user")]
+    del sessions["chat"]
+    assert timeline.merge(sessions) == [event(2, "Summary")]
+    assert len(timeline) == 1
+
+def test_renderer_matches_json_dumps():
+    from vla_star.context_engine.context_utilities import Context, OrderedContext, ContextRenderer
+    from vla_star.vla_complex.vla_complex_state import State, render_session
+
+    class Complex:
+        def __init__(self, tool_name, state):
+            self.tool_name = tool_name
+            self.state = state
+
+    arm = Complex("arm", State(session=[], impression={"carrying": None, "available objects": ["Lever 2"]}))
+    chat = Complex("chat", State(session=[], impression={}))
+    arm.state.add_to_session("Status", "picked up breakfast")
+    chat.state.add_to_session("user", "hi \"robot\"\nhow are you?")
+
+    renderer = ContextRenderer()
+    timeline = Timeline()
+    for _ in range(2):
+        ordered = OrderedContext(Context([arm, chat]), timeline, renderer)
+        ordered["INTERNAL_MESSAGE"] = {"note": "é"}
+        expected = json.dumps({
+            "Session": render_session(ordered.session),
+            "Impressions": ordered.impressions,
+            "INTERNAL_MESSAGE": {"note": "é"},
+        }, indent=2)
+        assert str(ordered) == expected
+        arm.state.impression["carrying"] = "breakfast"
+        chat.state.add_to_session("self", "good")
+
+def test_budgeter_keeps_newest_events():
+    from vla_star.context_engine.context_utilities import Context, OrderedContext, ContextBudgeter
+    from vla_star.vla_complex.vla_complex_state import State
+
+    class Complex:
+        tool_name = "arm"
+        def __init__(self):
+            self.state = State(session=[], impression={"carrying": None})
+
+    arm = Complex()
+    for i in range(50):
+        arm.state.add_to_session("Status", f"status update number {i}")
+    ordered = OrderedContext(Context([arm]), Timeline())
+    report = ContextBudgeter().fit(ordered, budget=200)
+    assert report.hit and report.events_kept + report.events_condensed == 50
+    assert ordered.session[-1].data == "status update number 49"
+    assert ordered.session[0].label == "Condensed"
+    assert sum(report.sections.values()) <= 200
@@ -0,0 +1,59 @@
+# PYTEST_DISABLE_PLUGIN_AUTOLOAD=1 python -m pytest tests
+
+import sys
+from pathlib import Path
+import time
+parent_dir = Path(__file__).resolve().parent
+sys.path.append(str(parent_dir.parent))
+
+from vla_star.context_engine.journal import MemoryJournal
+from vla_star.vla_complex.vla_complex_state import State, render_session
+
+class Complex:
+    def __init__(self, tool_name):
+        self.tool_name = tool_name
+        self.state = State(session=[], impression={"carrying": None})
+
+def test_journal_replays_onto_snapshot(tmp_path):
+    arm = Complex("arm")
+    journal = MemoryJournal(tmp_path, compact_every=2)
+    arm.state.add_to_session("Status", "one")
+    journal.record([arm])
+    arm.state.add_to_session("Status", "two")
+    journal.record([arm])
+    journal.close() # compacts
+    journal = MemoryJournal(tmp_path, compact_every=100)
+    journal.load()
+    arm.state.add_to_session("Status", "three")
+    arm.state.impression["carrying"] = "breakfast"
+    journal.record([arm])
+    while journal.lines_written < 1: # then crash, without compacting
+        time.sleep(0.01)
+    assert journal.journal_path(journal.generation).exists()
+    with open(journal.journal_path(journal.generation), "a") as f:
+        f.write('{"states": {"arm": {"app') # torn line
+
+    loaded = MemoryJournal(tmp_path).load()
+    assert loaded["arm"]["session"] == render_session(arm.state.session)
+    assert loaded["arm"]["impression"] == {"carrying": "breakfast"}
+
+def test_records_after_a_torn_load_survive_the_next_crash(tmp_path):
+    arm = Complex("arm")
+    journal = MemoryJournal(tmp_path, compact_every=100)
+    arm.state.add_to_session("Status", "one")
+    journal.record([arm])
+    while journal.lines_written < 1:
+        time.sleep(0.01)
+    path = journal.journal_path(journal.generation)
+    with open(path, "a") as f:
+        f.write('{"states": {"arm": {"app') # crash
+
+    journal = MemoryJournal(tmp_path, compact_every=100)
+    journal.load()
+    arm.state.add_to_session("Status", "two")
+    journal.record([arm])
+    while journal.lines_written < 1: # crash again, without compacting
+        time.sleep(0.01)
+
+    loaded = MemoryJournal(tmp_path).load()
+    assert loaded["arm"]["session"] == render_session(arm.state.session)
@@ -0,0 +1,57 @@
+# PYTEST_DISABLE_PLUGIN_AUTOLOAD=1 python -m pytest tests
+
+import sys
+from pathlib import Path
+parent_dir = Path(__file__).resolve().parent
+sys.path.append(str(parent_dir.parent))
+
+import asyncio
+from vla_star.context_engine.long_term_memory import LongTermMemory
+from vla_star.vla_complex.vla_complex_state import SessionEvent
+
+def test_recall_finds_relevant_archived_events(tmp_path):
+    memory = LongTermMemory(tmp_path)
+    memory.archive("arm", [SessionEvent("Status", f"moved to shelf {i}") for i in range(20)])
+    memory.archive("chat", [
+        SessionEvent("user", "my name is Olin and I like green tea"),
+        {"[2026-02-07 14:19:42] self": "noted, green tea"},
+    ])
+    recalled = memory.recall("what tea does Olin like?", k=2)
+    assert [record["tool"] for record in recalled] == ["chat", "chat"]
+    assert "green tea" in str(recalled[0]["event"])
+
+    reloaded = LongTermMemory(tmp_path)
+    assert len(reloaded) == 22
+    assert reloaded.recall("what tea does Olin like?", k=2) == recalled
+
+def test_embedding_requests_do_not_block_recall(tmp_path):
+    held = []
+    def embed(texts):
+        held.append(memory._lock.locked()) # a recall meanwhile would wait on it
+        return [[float(len(text)), 1.0] for text in texts]
+
+    memory = LongTermMemory(tmp_path, embed=embed)
+    memory.archive("chat", [SessionEvent("user", "green tea please")])
+    assert held == [False]
+    assert len(memory.vectors.vectors) == 1
+
+def test_vectors_are_saved_and_the_loop_never_embeds(tmp_path):
+    embedded = []
+    def embed(texts):
+        embedded.extend(texts)
+        return [[1.0, float("tea" in text)] for text in texts]
+
+    memory = LongTermMemory(tmp_path, embed=embed)
+    memory.archive("chat", [SessionEvent("user", "green tea please"), SessionEvent("user", "the door is open")])
+    assert len(embedded) == 2
+
+    reloaded = LongTermMemory(tmp_path, embed=embed)
+    assert len(reloaded) == 2 and len(reloaded.vectors) == 2 # read back, not embedded again
+    assert len(embedded) == 2
+
+    async def on_the_loop():
+        return reloaded.recall("tea", k=1)
+    assert "green tea" in str(asyncio.run(on_the_loop())[0]["event"])
+    assert len(embedded) == 2 # lexical only
+    asyncio.run(reloaded.recall_async("tea", k=1))
+    assert embedded[-1] == "tea"
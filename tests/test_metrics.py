@@ -0,0 +1,37 @@
+# PYTEST_DISABLE_PLUGIN_AUTOLOAD=1 python -m pytest tests
+
+import sys
+from pathlib import Path
+import csv
+parent_dir = Path(__file__).resolve().parent
+sys.path.append(str(parent_dir.parent))
+
+import vla_star.utilities.metrics as metrics
+
+class ResponsesUsage:
+    input_tokens = 1000
+    output_tokens = 100
+
+class ChatUsage:
+    prompt_tokens = 400
+    completion_tokens = 20
+
+def test_usage_is_batched_and_summed_by_caller(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(metrics, "METRICS_FLUSH_EVERY", 2)
+    profile = metrics.Profile("agent")
+
+    metrics.record(ResponsesUsage(), "o4-mini", "identity", profile)
+    with open(profile.model_usage_filename) as f:
+        assert len(list(csv.DictReader(f))) == 0 # buffered
+
+    with metrics.attributed(profile):
+        metrics.record(ChatUsage(), "o4-mini", "vlm")
+    with open(profile.model_usage_filename) as f:
+        rows = list(csv.DictReader(f))
+    assert [row["caller"] for row in rows] == ["identity", "vlm"]
+
+    summary = profile.summary()
+    assert summary["calls"] == 2
+    assert summary["by_caller"]["vlm"]["input_tokens"] == 400
+    assert abs(summary["cost"] - metrics.cost("o4-mini", 1400, 120)) < 1e-12
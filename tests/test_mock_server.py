@@ -0,0 +1,29 @@
+# PYTEST_DISABLE_PLUGIN_AUTOLOAD=1 python -m pytest tests
+
+import sys
+from pathlib import Path
+parent_dir = Path(__file__).resolve().parent
+sys.path.append(str(parent_dir.parent))
+
+import json
+import pytest
+from openai import OpenAI, InternalServerError
+from vla_star.tool_choice_models.mock_server import MockServer, MockConfig
+
+TOOLS = [{"type": "function", "name": "chat", "description": "Say something", "parameters": {
+    "type": "object", "properties": {"text": {"type": "string"}}, "required": ["text"]
+}}]
+
+def test_scripted_tool_calls_and_errors():
+    script = [{"tool": "chat", "arguments": {"text": "hello"}}, {"text": "thinking"}]
+    with MockServer(MockConfig(script=script)) as base_url:
+        client = OpenAI(base_url=base_url, api_key="mock")
+        first = client.responses.create(model="o4-mini", input="ctx", tools=TOOLS).output[0]
+        second = client.responses.create(model="o4-mini", input="ctx", tools=TOOLS).output[0]
+    assert (first.type, first.name, json.loads(first.arguments)) == ("function_call", "chat", {"text": "hello"})
+    assert second.type == "message"
+
+    with MockServer(MockConfig(error_rate=1.0)) as base_url:
+        client = OpenAI(base_url=base_url, api_key="mock", max_retries=0)
+        with pytest.raises(InternalServerError):
+            client.responses.create(model="o4-mini", input="ctx", tools=TOOLS)
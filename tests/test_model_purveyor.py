@@ -0,0 +1,165 @@
+# PYTEST_DISABLE_PLUGIN_AUTOLOAD=1 python -m pytest tests
+
+import sys
+from pathlib import Path
+parent_dir = Path(__file__).resolve().parent
+sys.path.append(str(parent_dir.parent))
+
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+import pytest
+from vla_star.tool_choice_models.model_purveyor import ModelPurveyor, ToolCallDispatch
+
+CHAT = {"type": "function", "name": "chat", "description": "Say something", "parameters": {
+    "type": "object", "properties": {"text": {"type": "string"}}, "required": ["text"]
+}}
+
+class Chatty:
+    """
+    Only ever answers with a message
+    """
+    tools = [CHAT]
+    model_string = "chatty"
+
+    def __init__(self):
+        self.tool_choices = []
+
+    async def run(self, input, tool_choice=None):
+        self.tool_choices.append(tool_choice)
+        message = SimpleNamespace(type="message", content=[SimpleNamespace(text="hello there")])
+        return SimpleNamespace(output=[message])
+
+def test_retries_are_bounded_forced_and_fall_back(monkeypatch):
+    monkeypatch.setattr(ModelPurveyor, "IDENTITY_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(ModelPurveyor, "FALLBACK_TOOL", "chat")
+    said = []
+    async def chat(text):
+        said.append(text)
+        return "sent"
+
+    identity, report = Chatty(), {}
+    [(tool_name, parameters, tool_return, _)] = asyncio.run(ModelPurveyor.run(identity, "ctx", {"chat": chat}, report=report))
+    assert identity.tool_choices == [None, "required", "required"]
+    assert report == {"attempts": 3, "fallback": True, "calls": 1, "completed": True}
+    assert (tool_name, parameters, tool_return, said) == ("chat", {"text": "hello there"}, "sent", ["hello there"])
+
+    monkeypatch.setattr(ModelPurveyor, "FALLBACK_TOOL", None)
+    monkeypatch.setattr(ModelPurveyor, "IDENTITY_RETRY_BACKOFF", 0.05)
+    t0 = time.perf_counter()
+    assert asyncio.run(ModelPurveyor.choose(Chatty(), "ctx")) is None
+    assert time.perf_counter() - t0 >= 0.15 # 0.05, then 0.1
+
+class SlowStreamer:
+    """
+    Its function call is complete long before its stream ends
+    """
+    tools = [CHAT]
+    model_string = "slow"
+    streams = True
+
+    def __init__(self):
+        self.finish = asyncio.Event()
+        self.finished = False
+
+    async def stream(self, input, tool_choice=None):
+        call = SimpleNamespace(type="function_call", name="chat", arguments=json.dumps({"text": "hi"}))
+        yield SimpleNamespace(type="response.output_item.done", item=call)
+        await self.finish.wait()
+        self.finished = True
+        yield SimpleNamespace(type="response.completed", response=SimpleNamespace(usage=None))
+
+def test_streaming_dispatches_before_the_stream_ends(monkeypatch):
+    monkeypatch.setattr(ModelPurveyor, "IDENTITY_STREAMING", True)
+    monkeypatch.setattr(ModelPurveyor, "PARALLEL_TOOL_CALLS", False) # returns at the first call
+    identity, said = SlowStreamer(), []
+    async def chat(text):
+        said.append(text)
+
+    async def main():
+        await ModelPurveyor.run(identity, "ctx", {"chat": chat})
+        assert said == ["hi"] and not identity.finished
+        identity.finish.set()
+        await asyncio.gather(*ModelPurveyor.draining)
+        assert identity.finished
+    asyncio.run(main())
+
+def call(name, **arguments):
+    return SimpleNamespace(type="function_call", name=name, arguments=json.dumps(arguments))
+
+def test_calls_run_concurrently_unless_ordered():
+    events = []
+    def tool(name):
+        async def run(seconds):
+            events.append(f"{name} start")
+            await asyncio.sleep(seconds)
+            events.append(f"{name} end")
+            return name
+        return run
+    tools = {name: tool(name) for name in ("look", "arm", "drive", "endgame")}
+
+    async def main(calls, ordering):
+        dispatches = ToolCallDispatch(tools, ordering=ordering)
+        for item in calls:
+            dispatches.submit(item)
+        return await dispatches.results()
+
+    results = asyncio.run(main([call("look", seconds=0.05), call("arm", seconds=0.01)], {}))
+    assert [tool_return for _, _, tool_return, _ in results] == ["look", "arm"] # in call order
+    assert events == ["look start", "arm start", "arm end", "look end"]
+
+    events.clear()
+    asyncio.run(main([call("arm", seconds=0.05), call("drive", seconds=0.01), call("look", seconds=0.01)], {"arm": "body", "drive": "body"}))
+    assert events.index("arm end") < events.index("drive start") and events.index("look start") < events.index("arm end")
+
+    events.clear()
+    asyncio.run(main([call("look", seconds=0.02), call("endgame", seconds=0.01), call("arm", seconds=0.01)], {"endgame": "*"}))
+    assert events == ["look start", "look end", "endgame start", "endgame end", "arm start", "arm end"]
+
+class Caller:
+    """
+    Calls chat after a delay
+    """
+    tools = [CHAT]
+    model_string = "same"
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    async def run(self, input, tool_choice=None):
+        await asyncio.sleep(self.delay)
+        return SimpleNamespace(output=[call("chat", text=f"after {self.delay}")])
+
+def test_hedges_are_told_apart_by_role_and_defaults_follow_the_class(monkeypatch):
+    async def chat(text):
+        return text
+
+    calls, report = asyncio.run(ModelPurveyor.hedged_run([Caller(0.2), Caller(0.01)], "ctx", {"chat": chat}, hedge_delay=0))
+    assert calls[0][2] == "after 0.01"
+    assert (report["winner"], report["winner_model"], report["models"]) == ("hedge", "same", {"primary": "same", "hedge": "same"})
+    assert list(report["attempts"]) == ["hedge"] # the primary was cancelled
+
+    monkeypatch.setattr(ModelPurveyor, "IDENTITY_MODEL_STRING", "gpt-4.1")
+    monkeypatch.delenv("CONTEXT_TOKEN_BUDGET", raising=False)
+    assert ModelPurveyor.identity("agent", "", []).model_string == "gpt-4.1"
+    assert ModelPurveyor.context_budget() == ModelPurveyor.context_budget("gpt-4.1")
+
+def test_a_fallback_does_not_win_the_race(monkeypatch):
+    monkeypatch.setattr(ModelPurveyor, "FALLBACK_TOOL", "chat")
+    monkeypatch.setattr(ModelPurveyor, "IDENTITY_MAX_ATTEMPTS", 1)
+    async def chat(text):
+        return text
+
+    calls, report = asyncio.run(ModelPurveyor.hedged_run([Caller(0.05), Chatty()], "ctx", {"chat": chat}, hedge_delay=0))
+    assert calls[0][2] == "after 0.05"
+    assert (report["winner"], report["fallback"]) == ("primary", False)
+
+    calls, report = asyncio.run(ModelPurveyor.hedged_run([Chatty(), Chatty()], "ctx", {"chat": chat}, hedge_delay=0))
+    assert calls[0][2] == "hello there" and report["fallback"]
+
+def test_a_request_cut_short_is_not_completed():
+    report = {}
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(asyncio.wait_for(ModelPurveyor.choose_calls(Caller(1), "ctx", report=report), 0.05))
+    assert report == {"completed": False, "attempts": 1}
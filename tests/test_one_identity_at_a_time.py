@@ -0,0 +1,66 @@
+# PYTEST_DISABLE_PLUGIN_AUTOLOAD=1 python -m pytest tests
+
+import sys
+from pathlib import Path
+parent_dir = Path(__file__).resolve().parent
+sys.path.append(str(parent_dir.parent))
+
+import asyncio
+from vla_star.context_engine.one_identity_at_a_time import SingleIdentityRunningLock, RerunRejected, RerunReplaced
+
+def run_burst(lock, priorities):
+    ran, outcomes = [], []
+    async def rerun(name, priority):
+        try:
+            async with lock.admit(priority):
+                ran.append(name)
+                await asyncio.sleep(0.01)
+            outcomes.append((name, "ran"))
+        except RerunReplaced:
+            outcomes.append((name, "replaced"))
+        except RerunRejected:
+            outcomes.append((name, "rejected"))
+    async def main():
+        await asyncio.gather(*(rerun(i, p) for i, p in enumerate(priorities)))
+    asyncio.run(main())
+    return ran, dict(outcomes)
+
+def test_reject_new_keeps_first_waiter():
+    lock = SingleIdentityRunningLock(policy="reject-new")
+    ran, outcomes = run_burst(lock, [1, 1, 1])
+    assert ran == [0, 1] and outcomes[2] == "rejected"
+    assert lock.counters()["rejected"] == 1
+
+def test_latest_wins_replaces_waiter():
+    lock = SingleIdentityRunningLock(policy="latest-wins")
+    ran, outcomes = run_burst(lock, [1, 1, 1])
+    assert ran == [0, 2] and outcomes[1] == "replaced"
+    assert (lock.admitted, lock.replaced, lock.rejected) == (3, 1, 0)
+
+def test_priority_runs_most_urgent_first():
+    lock = SingleIdentityRunningLock(policy="priority", max_waiters=2)
+    ran, outcomes = run_burst(lock, [1, 1, 1, 2, 0])
+    assert ran == [0, 3, 2] and outcomes[1] == "replaced" and outcomes[4] == "rejected"
+
+def test_cancelled_waiters_are_skipped():
+    async def main():
+        lock = SingleIdentityRunningLock(policy="latest-wins")
+        await lock.acquire()
+        waiter = asyncio.create_task(lock.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel() # its future is cancelled before the task gets to dequeue itself
+        lock.release() # no hand-off to it
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert not lock._active
+
+        await lock.acquire()
+        waiter = asyncio.create_task(lock.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        newcomer = asyncio.create_task(lock.acquire()) # not replacing the cancelled waiter
+        await asyncio.sleep(0)
+        lock.release()
+        await newcomer
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert lock.replaced == 0
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+# PYTEST_DISABLE_PLUGIN_AUTOLOAD=1 python -m pytest tests
+
+import sys
+from pathlib import Path
+parent_dir = Path(__file__).resolve().parent
+sys.path.append(str(parent_dir.parent))
+
+import asyncio
+import itertools
+import json
+from vla_star.context_engine.replay import Replayer, ReplayModel
+from vla_star.tool_choice_models.model_purveyor import ModelPurveyor
+
+TOOLS = [{"type": "function", "function": {
+    "name": "chat",
+    "description": "Say something",
+    "parameters": {"type": "object", "properties": {"text": {"type": "string"}}, "required": ["text"]}
+}}]
+
+def frame(session, sources, text):
+    context = {"Session": session, "Impressions": {"chat": {"Chatting with": "Olin"}}}
+    return {
+        "messages": [
+            {"role": "system", "content": "You are a robot."},
+            {"role": "user", "content": json.dumps(context, indent=2)},
+        ],
+        "tools": TOOLS,
+        "sources": sources,
+        "tool_choice_made": {"type": "function", "function": {"name": "chat", "parameters": {"text": text}}},
+    }
+
+def test_replay_reproduces_context_and_choices(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path) # nothing lands in the repo
+    session, sources, frames = [], [], []
+    for i in range(5):
+        session.append({f"[2026-02-07 14:19:00] {'user' if i % 2 else 'Status'}": f"event {i}"})
+        sources.append("chat" if i % 2 else "arm")
+        frames.append(frame(list(session), list(sources), f"reply {i}"))
+
+    replayer = Replayer(frames, memory_dir=tmp_path)
+    summary = asyncio.run(replayer.replay()).summary()
+    assert summary["frames"] == 5
+    assert summary["context_match_rate"] == 1.0
+    assert summary["choice_match_rate"] == 1.0
+    assert replayer.complexes["chat"].dispatched[-1] == {"text": "reply 4"}
+
+def test_unchanged_prompt_is_not_rerun(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path) # nothing lands in the repo
+    frames = [frame([{"[2026-02-07 14:19:00] user": "hello"}], ["chat"], "hi")] * 2
+    for priority, calls in ((1, 1), (2, 2)): # urgent stimuli (chat) always run
+        replayer = Replayer(frames, memory_dir=tmp_path)
+        replayer.engine.skip_unchanged_prompt = True
+        replayer.engine.inflight_priority = priority
+        asyncio.run(replayer.replay())
+        assert replayer.model.calls == calls
+        assert replayer.engine.metrics.summary()["counts"].get("suppressed_runs", 0) == 2 - calls
+
+def test_preemption_burst_still_completes_a_run(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path) # nothing lands in the repo
+    frames = [frame([{"[2026-02-07 14:19:00] user": "hello"}], ["chat"], "hi")]
+
+    async def burst(priorities):
+        replayer = Replayer(frames, model=ReplayModel(latency=0.05), memory_dir=tmp_path)
+        engine = replayer.engine
+        engine.preemption, engine.max_preemptions, engine.inflight_priority = True, 2, 1
+        run = asyncio.create_task(replayer.replay())
+        preemptions = 0
+        while not run.done():
+            preemptions += engine.preempt(next(priorities), "status")
+            await asyncio.sleep(0.01)
+        report = await run
+        return preemptions, replayer.model.calls, report.choice_matches
+
+    assert asyncio.run(burst(itertools.repeat(1))) == (0, 1, 1) # equal priority never preempts
+    assert asyncio.run(burst(itertools.count(2))) == (2, 3, 1) # ever more urgent: capped, then the run finishes
+    assert asyncio.run(burst(itertools.repeat(2))) == (2, 3, 1) # newer chats supersede the in-flight chat run
+
+def test_exhausted_retries_are_recorded_without_a_choice(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ModelPurveyor, "IDENTITY_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(ModelPurveyor, "FALLBACK_TOOL", None)
+    silent = frame([{"[2026-02-07 14:19:00] user": "hello"}], ["chat"], "hi")
+    silent["tool_choice_made"] = None # the model never calls a function
+    replayer = Replayer([silent], memory_dir=tmp_path)
+    asyncio.run(replayer.replay())
+    assert replayer.complexes["chat"].dispatched == []
+    assert replayer.engine.retry_stats == {"runs": 0, "retries": 0, "failed_runs": 1, "failed_retries": 1, "fallbacks": 0, "exhausted": 1}
+    assert replayer.engine.metrics.summary()["counts"] == {"identity_failed_retries": 1, "identity_exhausted": 1}
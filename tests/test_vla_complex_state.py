@@ -0,0 +1,53 @@
+# PYTEST_DISABLE_PLUGIN_AUTOLOAD=1 python -m pytest tests
+
+import sys
+import json
+import pickle
+from pathlib import Path
+parent_dir = Path(__file__).resolve().parent
+sys.path.append(str(parent_dir.parent))
+
+from vla_star.vla_complex.vla_complex_state import State, SessionEvent
+
+def test_session_renders_old_shape():
+    state = State(session=[], impression={})
+    state.add_to_session("Status", "picked up breakfast")
+    dumped = json.loads(State.states_to_json({"arm": state}))
+    (key, data), = dumped["arm"]["session"][0].items()
+    assert key.startswith("[") and key.endswith("] Status")
+    assert data == "picked up breakfast"
+
+def test_frozen_memory_is_migrated():
+    state = State(session=[], impression={})
+    state.session = [
+        {"[2026-02-07 14:19:42] Status": "picked up breakfast"},
+        {"[2026-02-07 14:19:43]": "a summary"},
+    ]
+    assert all(isinstance(event, SessionEvent) for event in state.session)
+    assert state.session[0].label == "Status"
+    assert state.model_dump(mode="json")["session"] == [
+        {"[2026-02-07 14:19:42] Status": "picked up breakfast"},
+        {"[2026-02-07 14:19:43]": "a summary"},
+    ]
+
+def test_same_second_events_keep_their_order():
+    state = State(session=[])
+    state.add_to_session("user", "first")
+    state.add_to_session("user", "second")
+    first, second = state.session
+    assert (first.ns, first.seq) < (second.ns, second.seq)
+
+def test_events_pickle_by_label():
+    state = State(session=[])
+    state.add_to_session("Meta-status", "Reinitialized position!")
+    restored = pickle.loads(pickle.dumps(state))
+    assert restored.session[0].to_dict() == state.session[0].to_dict()
+
+def test_extending_keeps_events_and_bumps_the_version():
+    state = State(session=[])
+    event = SessionEvent.from_key("[2026-02-07 14:19:42] Status", "picked up breakfast")
+    version = state.version
+    state.extend_session([event])
+    assert state.session == [event] and state.version == version + 1
+    state.extend_session([])
+    assert state.version == version + 1
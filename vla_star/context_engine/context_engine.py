@@ -18,8 +18,9 @@ from modules.tool_choice.demoed_input import ChoiceData, VLA_ComplexStripped
 import vla_star.utilities.metrics as metrics
 import asyncio
 import vla_star.context_engine.context_utilities as cu
-from vla_star.context_engine.context_utilities import Context, OrderedContext
-from vla_star.vla_complex.vla_complex_state import State
+from vla_star.context_engine.context_utilities import Context, OrderedContext, Timeline, ContextRenderer, ContextBudgeter, BudgetReport
+from vla_star.vla_complex.vla_complex_state import render_session
+from vla_star.utilities import tracing
 from vla_star.tool_choice_models.tool import Tool
 from typing import Callable
 """
@@ -37,17 +38,21 @@ class PrototypeEngine:
     tools: List[FunctionTool]
     model_tools: List[dict]
     tool_dispatcher: dict[str, Callable]
+    vla_complexes_by_name: dict[str, VLA_Complex]
     goal: Optional[str]
 
     def __init__(self, context_engine_name):
         self.context_engine_name = context_engine_name
         self.agent_identities = 0
         self.vla_complexes = []
+        self.vla_complexes_by_name = {}
         self.tools = []
         self.model_tools = []
+        self.tool_availability = None
         self.tool_dispatcher = {}
 
     def attach_tools(self, tools):
+        self.tool_availability = None
         for tool in tools:
             self.tools.append(tool)
             #print(f"{tool.name} linked to {self.context_engine_name}")
@@ -56,11 +61,16 @@ class PrototypeEngine:
             self.tool_dispatcher[tool.name] = tool.vla_complex.execute
             # Also add to vla_complexes - used for context
             self.vla_complexes.append(tool.vla_complex)
+            self.vla_complexes_by_name[tool.vla_complex.tool_name] = tool.vla_complex
 
     def instance_tools(self):
+        availability = tuple(tool.vla_complex.is_available for tool in self.tools)
+        if availability == self.tool_availability:
+            return # same list object, so the tool payload stays byte-identical
+        self.tool_availability = availability
         self.model_tools = []
-        for tool in self.tools:
-            if tool.vla_complex.is_available:
+        for tool, available in zip(self.tools, availability):
+            if available:
                 print(f"[Context] {tool.name} IS available.")
                 self.model_tools.append(tool.tool_dict)
             else:
@@ -68,80 +78,133 @@ class PrototypeEngine:
 
 
     def vla_complex_by_name(self, tool_name):
-        for vlac in self.vla_complexes:
-            if vlac.tool_name == tool_name:
-                return vlac
-        raise KeyError(f"Could not find VLA Complex by name {tool_name}")
+        try:
+            return self.vla_complexes_by_name[tool_name]
+        except KeyError:
+            raise KeyError(f"Could not find VLA Complex by name {tool_name}")
 
 from pathlib import Path
 from vla_star.context_engine.summarizer_compressor import Summarizer
+from vla_star.context_engine.journal import MemoryJournal
+from vla_star.context_engine.long_term_memory import LongTermMemory, LONG_TERM_MEMORY_TOP_K
 
 class ContextEngine(PrototypeEngine):
     context: Context
+    timeline: Timeline
+    renderer: ContextRenderer
     summarizer: Summarizer
     whether_to_always_summarize: bool
     frozen_memory_dir: Path
+    journal: MemoryJournal
+    long_term_memory: LongTermMemory
     recording: bool
+    summarization_task: Optional[asyncio.Task] = None
 
     def __init__(self, context_engine_name, whether_to_always_summarize: bool = False):
         super().__init__(context_engine_name)
         self.whether_to_always_summarize = whether_to_always_summarize
         self.summarizer = Summarizer()
+        self.timeline = Timeline() # survives between runs, only merges new events
+        self.renderer = ContextRenderer() # likewise, only serializes what changed
         self.frozen_memory_dir = Path("frozen") / self.context_engine_name
+        self.journal = MemoryJournal(self.frozen_memory_dir)
+        self.long_term_memory = LongTermMemory(self.frozen_memory_dir)
 
         if self.recording:
             if self.dataset is None:
                 self.dataset = Dataset(self.context_engine_name)
         
         
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ("summarization_task", "model_task"): # belong to a live event loop
+            state.pop(name, None)
+        return state
+
     def attach_tools(self, tools):
         super().attach_tools(tools)
         self.load_memory_dir_if_exists()
         
     def load_memory_dir_if_exists(self):
-        core_memory_filename = self.frozen_memory_dir / "core.json"
-        if core_memory_filename.exists():
-            with open(core_memory_filename, "r") as file:
-                f = file.read()
-                x = json.loads(f)
+        core_memory_filename = self.journal.snapshot_path
+        x = self.journal.load() # snapshot + journal tail
+        if x is not None:
             self.update_states_with_frozen_memory(x)
             print(f"[Context Engine] Loaded core memory at {core_memory_filename}.")
         else:
             print(f"[Context Engine] New core context created at {core_memory_filename}")
 
     def write(self):
-        states = State.form_map_from_vlac_name_to_vlac_state(self.vla_complexes)
-        states_json = State.states_to_json(states)
-        if not self.frozen_memory_dir.exists():
-            self.frozen_memory_dir.mkdir(parents=True, exist_ok=True)
-        
-        frozen_memory_filename = self.frozen_memory_dir / "core.json"
-        with open(frozen_memory_filename, "w") as f:
-            f.write(states_json)
+        # Only what changed since the last write, written behind by the journal's thread
+        self.journal.record(self.vla_complexes)
     
     def whether_to_summarize(self) -> bool:
         if self.whether_to_always_summarize:
             val = True
         else:
-            if self.total_complex_event_cnt() > 10:
+            if self.total_complex_event_cnt() > 10 and self.summarizer.pending_event_count(self.vla_complexes) >= self.summarizer.min_new_events:
                 val = True
             else:
                 val = False
         return val
     
     def total_complex_event_cnt(self):
-        cnt = 0
-        for vlac in self.vla_complexes:
-            if vlac.state.session:
-                cnt += len(vlac.state.session)
-        return cnt
+        # Brings the timeline up to date; the ordering right after reuses it
+        self.timeline.refresh(self.sessions_by_name())
+        return self.timeline.event_count
+
+    def sessions_by_name(self) -> dict[str, List]:
+        return {
+            vlac.tool_name: vlac.state.session
+            for vlac in self.vla_complexes
+            if vlac.state.session
+        }
 
     async def summarize_states(self):
-        self.summarized_states = await self.summarizer.compress_all_states(self.vla_complexes)
+        self.summary_snapshot = self.summarizer.snapshot(self.vla_complexes)
+        self.summarized_states = await self.summarizer.compress_snapshot(self.summary_snapshot)
         return self.summarized_states
     
-    def update_states_with_summarization(self, summarized_states):
-        self.summarizer.update_vla_complexes(self.vla_complexes, summarized_states)
+    def update_states_with_summarization(self, summarized_states) -> set[str]:
+        """
+        Returns the tools whose sessions were replaced, for archive_summarized()
+        """
+        return self.summarizer.update_vla_complexes(self.vla_complexes, summarized_states, self.summary_snapshot)
+
+    def archive_summarized(self, tool_names: set[str], snapshot):
+        # The raw events a summary replaced (not the previous summary) go to long-term memory.
+        # Blocking: file appends, indexing and maybe embedding requests
+        for tool_name in tool_names:
+            session = snapshot.states[tool_name].session
+            self.long_term_memory.archive(
+                tool_name,
+                session[snapshot.digests.get(tool_name, 0):snapshot.lengths[tool_name]]
+            )
+
+    def start_background_summarization(self):
+        """
+        Kicks off a summary if one is due and none is running. Identity runs never wait on it.
+        """
+        if self.summarization_task is not None and not self.summarization_task.done():
+            return
+        if not self.whether_to_summarize():
+            return
+        self.summarization_task = asyncio.create_task(self.summarize_in_background())
+
+    async def summarize_in_background(self):
+        with tracing.span("summarization"):
+            try:
+                ss = await self.summarize_states()
+            except Exception as e:
+                print(f"[Context Engine] Summarization failed: {e}")
+                return
+            # No awaits across the swap: it's atomic w.r.t. identity runs
+            updated = self.update_states_with_summarization(ss)
+            try:
+                # The snapshot's copies are ours alone, so archiving can run off the loop
+                await asyncio.to_thread(self.archive_summarized, updated, self.summary_snapshot)
+            except Exception as e:
+                print(f"[Context Engine] Archiving summarized events failed: {e}")
 
     def update_states_with_frozen_memory(self, states_json):
         for vla_complex in self.vla_complexes:
@@ -153,6 +216,7 @@ class ContextEngine(PrototypeEngine):
                 pass
             if vla_complex.state.session is not None:
                 #print(f"\t{vla_complex} session: {vla_complex.state.session} <== {states_json[vla_complex.tool_name]['session']}")
+                # Old-style {"[timestamp] label": data} events are migrated by State
                 vla_complex.state.session = states_json[vla_complex.tool_name]["session"]
                 # Special case:
                 if vla_complex.tool_name == "drive":
@@ -186,7 +250,7 @@ class OrderedContextEngine(ContextEngine):
         
 
     def order_context(self):
-        self.ordered_context = OrderedContext(self.context)
+        self.ordered_context = OrderedContext(self.context, self.timeline, self.renderer)
 
     def write(self):
         super().write()
@@ -434,15 +498,34 @@ class OrderedContextEngineDemoed(OrderedContextEngine):
     def execute_vla_complex(self, vla_complex, *instruction):
         asyncio.run(vla_complex.execute(*instruction))
 
-from vla_star.context_engine.one_identity_at_a_time import SingleIdentityRunningLock
+from vla_star.context_engine.one_identity_at_a_time import SingleIdentityRunningLock, RerunRejected, RerunReplaced
 
 
 from vla_star.tool_choice_models.model_purveyor import ModelPurveyor
 from vla_star.tool_choice_models.models_interface import Model
+from collections import OrderedDict
+import hashlib
 
 
 from agents import Agent, Runner, function_tool
 
+PREEMPTION = os.environ.get("IDENTITY_PREEMPTION", "0") == "1"
+# Restarts one identity run may take. After that the in-flight model request always finishes
+MAX_PREEMPTIONS = int(os.environ.get("MAX_PREEMPTIONS", 2))
+# How urgent a stimulus is, by source. Anything else counts as 1.
+SOURCE_PRIORITIES = json.loads(os.environ.get("SOURCE_PRIORITIES", '{"chat": 2}'))
+# Priorities at which a stimulus also preempts an in-flight run of the same priority (a newer chat
+# message supersedes the run answering the last one). Otherwise only a more urgent one does.
+EQUAL_PRIORITY_PREEMPTION = set(json.loads(os.environ.get("EQUAL_PRIORITY_PREEMPTION", "[2]")))
+
+IDENTITY_CACHE_SIZE = 32
+# Skip identity runs whose prompt (system, tools, ordered context) is the same as the last completed run's.
+# Stimuli above priority 1 (e.g. chat) always run: the same message twice still deserves an answer
+SKIP_UNCHANGED_PROMPT = os.environ.get("SKIP_UNCHANGED_PROMPT", "0") == "1"
+
+class IdentityPreempted(Exception):
+    pass
+
 class OrderedContextLLMEngine(OrderedContextEngine):
     construction: str
     instructions: str
@@ -451,9 +534,14 @@ class OrderedContextLLMEngine(OrderedContextEngine):
     goal: Optional[str]
     model_name: str
     identity: Model
+    hedge_identity: Optional[Model] = None
     identity_lock: SingleIdentityRunningLock
+    budgeter: ContextBudgeter
+    budget_report: Optional[BudgetReport] = None
+    preemption: bool
+    model_task: Optional[asyncio.Task] = None
 
-    def __init__(self, context_engine_name: str, construction: str, instructions: str, motive: str, extra: str, recorded: bool):
+    def __init__(self, context_engine_name: str, construction: str, instructions: str, motive: str, extra: str, recorded: bool, admission_policy: Optional[str] = None):
         self.recording = recorded
         super().__init__(context_engine_name)
         self.construction = construction
@@ -462,42 +550,299 @@ class OrderedContextLLMEngine(OrderedContextEngine):
         self.extra = extra
         
         self.model_name="o4-mini"
-        self.identity_lock = SingleIdentityRunningLock()
-
-        self.metrics = metrics.Profile(context_engine_name)
+        self.identity_lock = SingleIdentityRunningLock(policy=admission_policy)
+        self.carried_messages = [] # internal messages of reruns that were replaced in the queue
+        self.budgeter = ContextBudgeter(self.renderer)
+
+        self.preemption = PREEMPTION
+        self.max_preemptions = MAX_PREEMPTIONS
+        self.equal_priority_preemption = EQUAL_PRIORITY_PREEMPTION
+        self.run_preemptions = 0 # of the current run
+        self.preemptible = False
+        self.preempted = False
+        self.inflight_priority = 0
+        self.exceptional_message = None
+        self.preempting_messages = []
+        self.model_latency = None # moving average of completed model requests
+        self.preemption_stats = {
+            "preemptions": 0,
+            "wasted_seconds": 0.0,
+            "wasted_input_tokens": 0, # estimated, the provider may bill some of it anyway
+            "latency_saved_seconds": 0.0,
+        }
+
+        # (system prompt, available tools, model strings) -> (identity, hedge identity)
+        self.identity_cache: OrderedDict[tuple, tuple[Model, Optional[Model]]] = OrderedDict()
+        self.identity_cache_hits = 0
+        self.identity_cache_misses = 0
+
+        self.hedge_report = None
+        self.hedge_stats = {} # role (primary, hedge) -> model, runs, wins, latency
+
+        self.choice_report = {} # attempts, fallback and number of calls of the last model run
+        # Runs that got a function call from the model, and runs that ran out of attempts (failed),
+        # which end in the FALLBACK_TOOL or, without one, in nothing at all (exhausted)
+        self.retry_stats = {"runs": 0, "retries": 0, "failed_runs": 0, "failed_retries": 0, "fallbacks": 0, "exhausted": 0}
+
+        self.skip_unchanged_prompt = SKIP_UNCHANGED_PROMPT
+        self.last_prompt_hash: Optional[str] = None # of the last completed run
+        self.unchanged_prompt_stats = {
+            "runs": 0,
+            "suppressed": 0,
+            "saved_input_tokens": 0, # estimated
+        }
+
+        self.metrics = self.metrics_profile()
+        self.summarizer.profile = self.metrics
+
+    def metrics_profile(self) -> metrics.Profile:
+        return metrics.Profile(self.context_engine_name)
 
     def assemble_context(self, exceptional_message: Optional[str]):
+        with tracing.span("assemble_context"):
+            self._assemble_context(exceptional_message)
+
+    def _assemble_context(self, exceptional_message: Optional[str]):
+        self.exceptional_message = exceptional_message
         self.context_init() # may be summarized or not
         self.order_context()
         if exceptional_message is not None:
             self.ordered_context["INTERNAL_MESSAGE"] = exceptional_message
+        recalled = self.long_term_memory.recall(self.recall_query(exceptional_message), LONG_TERM_MEMORY_TOP_K)
+        if recalled:
+            self.ordered_context["Recalled"] = recalled
+        self.budget_report = self.budgeter.fit(
+            self.ordered_context,
+            ModelPurveyor.context_budget(),
+            system=self.instance_system_prompt(),
+            tools=self.model_tools
+        )
 
-    async def request(self, exceptional_message: Optional[str] = None):
+    def recall_query(self, exceptional_message: Optional[str], recent: int = 3) -> str:
+        # The stimulus: whatever triggered this run, and the last few events
+        parts = [str(exceptional_message)] if exceptional_message is not None else []
+        parts.extend(json.dumps(event, default=str) for event in render_session(self.ordered_context.session[-recent:]))
+        return "\n".join(parts)
+
+    async def request(self, exceptional_message: Optional[str] = None, priority: int = 1):
+        with metrics.attributed(self.metrics): # summarization and tools started from here count toward this agent
+            await self._request(exceptional_message, priority)
+
+    async def _request(self, exceptional_message: Optional[str] = None, priority: int = 1):
         print(f"[ContextEngine] Agent Identity requested.")
         
+        self.start_background_summarization()
+        lock_requested = tracing.now_us()
         try:
-            async with self.identity_lock:
-                if self.whether_to_summarize():
-                    ss = await self.summarize_states()
-                    self.update_states_with_summarization(ss)
-                self.assemble_context(exceptional_message)
+            async with self.identity_lock.admit(priority):
+                tracing.tracer.record("lock_wait", lock_requested, tracing.now_us())
+                self.inflight_priority = priority
+                messages = [*self.carried_messages, exceptional_message]
+                self.carried_messages = []
+                messages = [m for m in messages if m is not None]
+                self.assemble_context("\n".join(messages) if messages else None)
                 await self.run_identity()
-        except RuntimeError:
-            #print("Identity rejected...")
-            pass
+        except RerunReplaced:
+            tracing.tracer.record("lock_wait", lock_requested, tracing.now_us(), outcome="replaced")
+            # The newer rerun will see the same context, but not our message
+            if exceptional_message is not None:
+                self.carried_messages.append(exceptional_message)
+        except RerunRejected as e:
+            tracing.tracer.record("lock_wait", lock_requested, tracing.now_us(), outcome="rejected")
+            print(f"[ContextEngine] {e}")
+
     async def run_identity(self):
+        with tracing.span("identity_run"):
+            self.create_identity()
+            await self.run_the_identity()
+
+    def source_priority(self, sources: List[Any]) -> int:
+        return max(
+            (SOURCE_PRIORITIES.get(source, 1) if type(source) == str else 1 for source in sources),
+            default=1
+        )
+
+    def preempt(self, priority: int, exceptional_message: Optional[str] = None) -> bool:
+        """
+        Cancels the in-flight model request if no tool has been dispatched yet, the new stimulus
+        is more urgent (or as urgent, at a priority in equal_priority_preemption) and the run
+        hasn't been restarted max_preemptions times already. The run then restarts with fresh context.
+        At any other priority, a stimulus as urgent as the in-flight run waits for it instead.
+        """
+        if not self.preemption or not self.preemptible or self.model_task is None or self.model_task.done():
+            return False
+        if priority < self.inflight_priority or self.run_preemptions >= self.max_preemptions:
+            return False
+        if priority == self.inflight_priority and priority not in self.equal_priority_preemption:
+            return False
+        self.run_preemptions += 1
+        self.preempted = True
+        self.preemptible = False
+        self.inflight_priority = priority
+        if exceptional_message is not None:
+            self.preempting_messages.append(exceptional_message)
+
+        elapsed = time.time() - self.t0_identity_run
+        self.preemption_stats["preemptions"] += 1
+        self.preemption_stats["wasted_seconds"] += elapsed
+        if self.budget_report is not None:
+            self.preemption_stats["wasted_input_tokens"] += sum(self.budget_report.sections.values())
+        if self.model_latency is not None:
+            # What we'd have waited for the stale run to finish
+            self.preemption_stats["latency_saved_seconds"] += max(0.0, self.model_latency - elapsed)
+        print(f"[ContextEngine] Preempting stale identity run after {elapsed:.2f}s. {self.preemption_stats}")
+        self.model_task.cancel()
+        return True
+
+    def close_preemption(self):
+        self.preemptible = False
+
+    def prompt_hash(self, context: str) -> str:
+        """
+        Of everything the identity would be sent: the model, system prompt, tools and ordered context
+        """
+        digest = hashlib.sha256()
+        for part in (getattr(self.identity, "model_string", None), self.system, json.dumps(self.model_tools, sort_keys=True, default=str), context):
+            digest.update(str(part).encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def suppress_unchanged(self, prompt_hash: str) -> bool:
+        """
+        Whether to skip this run: the model would see exactly what it saw last time, and nothing urgent asked for it.
+        """
+        self.unchanged_prompt_stats["runs"] += 1
+        if not self.skip_unchanged_prompt or prompt_hash != self.last_prompt_hash or self.inflight_priority > 1:
+            return False
+        self.unchanged_prompt_stats["suppressed"] += 1
+        self.metrics.count("suppressed_runs")
+        if self.budget_report is not None:
+            self.unchanged_prompt_stats["saved_input_tokens"] += sum(self.budget_report.sections.values())
+        print(f"[ContextEngine] Prompt unchanged since the last run, skipping it. {self.unchanged_prompt_stats}")
+        return True
+
+    async def model_run(self, context: str, on_dispatch=None):
+        if self.hedge_identity is None:
+            self.choice_report = {}
+            try:
+                return await ModelPurveyor.run(self.identity, context, self.tool_dispatcher, on_dispatch, self.choice_report)
+            finally:
+                self.record_retries(self.choice_report)
+        result, self.hedge_report = await ModelPurveyor.hedged_run(
+            [self.identity, self.hedge_identity], context, self.tool_dispatcher, on_dispatch=on_dispatch
+        )
+        self.record_hedge(self.hedge_report)
+        self.choice_report = {
+            "attempts": self.hedge_report["attempts"].get(self.hedge_report["winner"], max(self.hedge_report["attempts"].values(), default=0)),
+            "fallback": self.hedge_report["fallback"] or self.hedge_report["winner"] is None,
+            "calls": self.hedge_report["calls"],
+            "completed": bool(self.hedge_report["latency"]), # some identity answered
+        }
+        self.record_retries(self.choice_report)
+        return result
+
+    def record_retries(self, report: dict):
+        if not report.get("completed"):
+            return # preempted, cancelled or failed mid-request: neither a success nor a failure
+        attempts = report["attempts"]
+        if not report.get("fallback"):
+            self.retry_stats["runs"] += 1
+            self.retry_stats["retries"] += attempts - 1
+            self.metrics.count("identity_retries", attempts - 1)
+            return
+        self.retry_stats["failed_runs"] += 1
+        self.retry_stats["failed_retries"] += attempts - 1
+        self.metrics.count("identity_failed_retries", attempts - 1)
+        if report.get("calls"):
+            self.retry_stats["fallbacks"] += 1
+            self.metrics.count("identity_fallbacks")
+        else:
+            self.retry_stats["exhausted"] += 1
+            self.metrics.count("identity_exhausted")
+
+    def record_hedge(self, report: dict):
+        for role, model_string in report["models"].items():
+            stats = self.hedge_stats.setdefault(role, {"runs": 0, "completed": 0, "wins": 0, "latency": 0.0})
+            stats["model"] = model_string
+            stats["runs"] += 1
+            stats["wins"] += report["winner"] == role
+            if role in report["latency"]: # answered before it was cancelled
+                stats["completed"] += 1
+                stats["latency"] += report["latency"][role]
+            stats["win_rate"] = stats["wins"] / stats["runs"]
+            stats["mean_latency"] = stats["latency"] / stats["completed"] if stats["completed"] else None
+        print(f"[ContextEngine] Hedge won by {report['winner']} ({report['winner_model']}): {report['latency']}")
+
+    async def preemptible_run(self, context: str):
+        if not self.preemption:
+            return await self.model_run(context)
+        self.preempted = False
+        self.preemptible = True
+        self.model_task = asyncio.create_task(
+            self.model_run(context, on_dispatch=self.close_preemption)
+        )
+        try:
+            result = await self.model_task
+        except asyncio.CancelledError:
+            if self.preempted:
+                raise IdentityPreempted()
+            raise
+        finally:
+            self.preemptible = False
+            self.model_task = None
+        latency = time.time() - self.t0_identity_run
+        self.model_latency = latency if self.model_latency is None else 0.8 * self.model_latency + 0.2 * latency
+        return result
+
+    def restart_after_preemption(self):
+        if self.recording:
+            self.dataset.discard_frame()
+        messages = [m for m in [self.exceptional_message, *self.preempting_messages] if m is not None]
+        self.preempting_messages = []
+        self.assemble_context("\n".join(messages) if messages else None)
         self.create_identity()
-        await self.run_the_identity()
 
     def create_identity(self):
         self.instance_tools() # addressing whether available or not
+        system = self.instance_system_prompt()
+        key = (
+            system,
+            tuple(tool["name"] for tool in self.model_tools),
+            ModelPurveyor.IDENTITY_MODEL_STRING,
+            ModelPurveyor.HEDGE_MODEL_STRING
+        )
+        cached = self.identity_cache.get(key)
+        if cached is not None:
+            self.identity_cache.move_to_end(key)
+            self.identity_cache_hits += 1
+            self.identity, self.hedge_identity = cached
+            return
+        self.identity_cache_misses += 1
         self.identity = ModelPurveyor.identity(
             self.context_engine_name + str(self.agent_identities),
-            self.instance_system_prompt(),
+            system,
             self.model_tools
         )
+        if ModelPurveyor.HEDGE_MODEL_STRING:
+            self.hedge_identity = ModelPurveyor.identity(
+                self.context_engine_name + str(self.agent_identities),
+                system,
+                self.model_tools,
+                model_string=ModelPurveyor.HEDGE_MODEL_STRING
+            )
+        self.identity_cache[key] = (self.identity, self.hedge_identity)
+        if len(self.identity_cache) > IDENTITY_CACHE_SIZE:
+            self.identity_cache.popitem(last=False)
         #print(f"Identity created with tools: {self.identity.tools}")
 
+    def identity_cache_stats(self) -> dict:
+        runs = self.identity_cache_hits + self.identity_cache_misses
+        return {
+            "hits": self.identity_cache_hits,
+            "misses": self.identity_cache_misses,
+            "hit_rate": self.identity_cache_hits / runs if runs else None,
+        }
+
     def instance_available_tools(self):
         model_tools = []
         for tool in self.model_tools:
@@ -508,52 +853,88 @@ class OrderedContextLLMEngine(OrderedContextEngine):
 
 
     async def run_the_identity(self):
-        
-        try:
-            context = str(self.ordered_context)
-            ############
-            # MONSENIOR NO CONTEXT
-            ############
-            ### context = self.ordered_context.impressions["chat_with_player"].get("Current user message", "No user message")
-            ### END MONSENIOR NO CONTEXT
-            #print(f"___Prompt__\n{context}")
-            self.write()
-            self.t0_identity_run = time.time()
-
-            
-        except Exception as e:
-            print(f"Error setting up identity run: {e}")
-            return "This task is trash"
+        self.run_preemptions = 0
+        while True:
+            try:
+                context = str(self.ordered_context)
+                prompt_hash = self.prompt_hash(context)
+                if self.suppress_unchanged(prompt_hash):
+                    tracing.tracer.record("identity_suppressed", tracing.now_us(), tracing.now_us())
+                    self.write()
+                    self.write_output(None, {
+                        "model": None,
+                        "name": self.context_engine_name,
+                        "suppressed": "unchanged_prompt",
+                        "unchanged_prompt": self.unchanged_prompt_stats,
+                        "usage": self.metrics.summary()
+                    })
+                    return
+                ############
+                # MONSENIOR NO CONTEXT
+                ############
+                ### context = self.ordered_context.impressions["chat_with_player"].get("Current user message", "No user message")
+                ### END MONSENIOR NO CONTEXT
+                #print(f"___Prompt__\n{context}")
+                self.write()
+                self.t0_identity_run = time.time()
+
+                
+            except Exception as e:
+                print(f"Error setting up identity run: {e}")
+                return "This task is trash"
+            try:
+                print(f"[ContextEngine] Identity run initiated.")
+                calls = await self.preemptible_run(context)
+                self.last_prompt_hash = prompt_hash
+                break
+            except IdentityPreempted:
+                self.restart_after_preemption()
+            except Exception as e:
+                print(f"Wish I could cancel: {e}")
+                return "This task is trash"
         try:
-            print(f"[ContextEngine] Identity run initiated.")
-            tool_name, parameters, tool_return, minirerun = await ModelPurveyor.run(self.identity, context, self.tool_dispatcher)
             ## These last two lines will have to be changed with added models.
             
+            exhausted = self.choice_report.get("calls") == 0 # out of attempts and no FALLBACK_TOOL: nothing was chosen
+            if exhausted:
+                print(f"[ContextEngine] Identity run made no choice after {self.choice_report.get('attempts')} attempts.")
             self.write_output(
-                ToolChoiceMade(
-                    function={
-                        "name": tool_name,
-                        "description": self.vla_complex_by_name(tool_name).execute.__doc__,
-                        "parameters": parameters
-                    }
-                )
+                None if exhausted else [
+                    ToolChoiceMade(
+                        function={
+                            "name": tool_name,
+                            "description": self.vla_complexes_by_name[tool_name].execute.__doc__ if tool_name in self.vla_complexes_by_name else None,
+                            "parameters": parameters
+                        }
+                    )
+                    for tool_name, parameters, _, _ in calls
+                ]
                 ,{
-                    "model": ModelPurveyor.IDENTITY_MODEL_STRING,
+                    "outcome": "exhausted_retries" if exhausted else "tool_choice",
+                    "model": self.hedge_report["winner_model"] if self.hedge_identity else ModelPurveyor.IDENTITY_MODEL_STRING,
                     "name": self.context_engine_name,
-                    "latency": time.time() - self.t0_identity_run
+                    "latency": time.time() - self.t0_identity_run,
+                    "context_budget": asdict(self.budget_report) if self.budget_report else None,
+                    "preemptions": self.run_preemptions,
+                    "admission": self.identity_lock.counters(),
+                    "identity_cache": self.identity_cache_stats(),
+                    "retries": {**self.choice_report, "totals": self.retry_stats},
+                    "unchanged_prompt": self.unchanged_prompt_stats,
+                    "hedge": {**self.hedge_report, "stats": self.hedge_stats} if self.hedge_identity else None,
+                    "usage": self.metrics.summary()
                 }
             )
 
             # kind of lazy
-            if minirerun:
+            reruns = [tool_return for _, _, tool_return, minirerun in calls if minirerun]
+            if reruns:
                 print(f"[ContextEngine] Mini-rerun initiated.")
                 self.assemble_context(None)
                 self.create_identity()
-                self.ordered_context.impressions.update(tool_return)
+                for tool_return in reruns:
+                    self.ordered_context.add_impressions(tool_return)
                 mininewcontext = str(self.ordered_context)
-                tool_name, parameters, tool_return, minirerun = await ModelPurveyor.run(self.identity, mininewcontext, self.tool_dispatcher)
-
-            # self.metrics.add_model_usage(result.context_wrapper.usage, self.model_name)
+                await self.model_run(mininewcontext)
         except Exception as e:
             print(f"Wish I could cancel: {e}")
             return "This task is trash"
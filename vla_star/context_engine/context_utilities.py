@@ -1,10 +1,15 @@
 from datetime import datetime
 from typing import List, Dict, Any, Optional
+from bisect import bisect_right
+from collections import Counter
+from dataclasses import dataclass, field
+import heapq
 import json
+import math
 from vla_star.vla_complex.vla_complex import VLA_Complex
 TIMESTAMP_FORMAT = "[%Y-%m-%d %H:%M:%S]"
 from pydantic import BaseModel
-from vla_star.vla_complex.vla_complex_state import State
+from vla_star.vla_complex.vla_complex_state import State, SessionEvent, render_session
 from vla_star.vla_complex.vla_complex import VLA_Complex
 from vla_star.context_engine.summarizer_compressor import Summarizer, SummarizedSessions
 
@@ -15,10 +20,11 @@ Utilities for context management
 class Context:
     sessions: dict[str, List]
     impressions: dict[str, Any]
+    versions: dict[str, int]
 
     def __str__(self):
         return json.dumps({
-            "Sessions": self.sessions,
+            "Sessions": {name: render_session(session) for name, session in self.sessions.items()},
             "Impressions": self.impressions,
         }, indent=2)
 
@@ -29,52 +35,317 @@ class Context:
     def pull_states(self, vla_complexes):
         self.sessions = {}
         self.impressions = {}
+        self.versions = {}
         for vlac in vla_complexes:
             
             if vlac.state.session:
                 self.sessions[vlac.tool_name] = vlac.state.session
             if vlac.state.impression:
                 self.impressions[vlac.tool_name] = vlac.state.impression
+                self.versions[vlac.tool_name] = vlac.state.version
             if hasattr(vlac, "restore"):
                 vlac.restore()
 
 class OrderedContext:
     session: List
+    sources: Optional[List[Optional[str]]] # tool each session event came from, when known
     impressions: dict[str, Any]
+    versions: dict[str, int]
+    extras: dict[str, Any]
+    renderer: Optional["ContextRenderer"]
 
     def __str__(self):
-        return json.dumps({
-            "Session": self.session,
-            "Impressions": self.impressions
-        }, indent=2)
+        if self._rendered is None:
+            if self.renderer is None:
+                self._rendered = json.dumps({
+                    "Session": render_session(self.session),
+                    "Impressions": self.impressions,
+                    **self.extras
+                }, indent=2)
+            else:
+                self._rendered = self.renderer.render(self)
+        return self._rendered
+
+    def __setitem__(self, key: str, value: Any):
+        # e.g. INTERNAL_MESSAGE
+        self.extras[key] = value
+        self._rendered = None
+
+    def add_impressions(self, impressions: dict[str, Any]):
+        self.impressions = {**self.impressions, **impressions}
+        self.versions = {name: v for name, v in self.versions.items() if name not in impressions}
+        self._rendered = None
+
+    def replace_session(self, session: List, sources: Optional[List[Optional[str]]] = None):
+        self.session = session
+        self.sources = sources
+        self._rendered = None
 
-    def order(self, context):
-        self.session = self.order_sessions_in_time(context.sessions)
+    def order(self, context, timeline: Optional["Timeline"] = None):
+        if timeline is None:
+            self.session = self.order_sessions_in_time(context.sessions)
+            self.sources = None
+        else:
+            self.session = timeline.merge(context.sessions)
+            self.sources = timeline.sources()
         self.impressions = context.impressions
+        self.versions = context.versions
         pass
 
-    def __init__(self, context: Context):
-        self.order(context)
+    def __init__(self, context: Context, timeline: Optional["Timeline"] = None, renderer: Optional["ContextRenderer"] = None):
+        self.extras = {}
+        self.renderer = renderer
+        self._rendered = None
+        self.order(context, timeline)
 
     def order_sessions_in_time(
         self,
         sessions: Dict[str, List[Dict[str, Any]]]
     ) -> List[Dict[str, Any]]:
         """
-        Orders all session entries across session types by timestamp
-        embedded in their dictionary keys.
+        Orders all session entries across session types by timestamp.
         """
+        # Each session is already in time order, so a k-way merge is enough
+        return list(heapq.merge(*sessions.values(), key=event_time_ns))
+
+
+def extract_timestamp(item: Dict[str, Any]) -> datetime:
+    key = next(iter(item.keys()))
+    timestamp_str = key.split("]")[0] + "]"
+    return datetime.strptime(timestamp_str, TIMESTAMP_FORMAT)
+
+def event_time_ns(event) -> int:
+    if isinstance(event, SessionEvent):
+        return event.ns
+    # Old-style {"[timestamp] label": data} event
+    return int(extract_timestamp(event).timestamp() * 1e9)
+
+
+class Timeline:
+    """
+    Incremental, merged view of every VLA_Complex session.
+
+    Sessions only grow between identity runs (events get appended), so the
+    timeline remembers how far into each session it has read and only parses
+    and merges the new tail. A session that got replaced (summarization, frozen
+    memory) or shrunk is dropped and re-read from the start.
+    """
+    def __init__(self):
+        self._sources: dict[str, List] = {} # tool_name -> session list last read
+        self._read: dict[str, int] = {}     # tool_name -> events read from it
+        self._keys: List[tuple] = []        # (epoch ns, arrival) - sorted
+        self._events: List[tuple] = []      # (tool_name, event), parallel to _keys
+        self._arrivals = 0
+        self.event_count = 0
+
+    def __len__(self):
+        return self.event_count
+
+    def merge(self, sessions: Dict[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        self.refresh(sessions)
+        return [event for _, event in self._events]
+
+    def sources(self) -> List[str]:
+        # Tool name of each merged event
+        return [tool_name for tool_name, _ in self._events]
+
+    def refresh(self, sessions: Dict[str, List[Dict[str, Any]]]):
+        for tool_name in list(self._sources):
+            if tool_name not in sessions:
+                self._forget(tool_name)
+
+        fresh = []
+        for tool_name, session in sessions.items():
+            if self._sources.get(tool_name) is not session or len(session) < self._read[tool_name]:
+                self._forget(tool_name)
+                self._sources[tool_name] = session
+                self._read[tool_name] = 0
+            start = self._read[tool_name]
+            if start == len(session):
+                continue
+            fresh.append([
+                ((event_time_ns(event), self._next_arrival()), (tool_name, event))
+                for event in session[start:]
+            ])
+            self._read[tool_name] = len(session)
+
+        if fresh:
+            self._insert(list(heapq.merge(*fresh, key=lambda pair: pair[0])))
+
+    def _next_arrival(self) -> int:
+        self._arrivals += 1
+        return self._arrivals
+
+    def _insert(self, batch: List[tuple]):
+        # New events are usually newer than anything merged so far -> append.
+        # Otherwise only the overlapping tail gets re-merged.
+        split = bisect_right(self._keys, batch[0][0])
+        tail = list(zip(self._keys[split:], self._events[split:])) if split < len(self._keys) else []
+        del self._keys[split:]
+        del self._events[split:]
+        for key, event in heapq.merge(tail, batch, key=lambda pair: pair[0]):
+            self._keys.append(key)
+            self._events.append(event)
+        self.event_count = len(self._keys)
+
+    def _forget(self, tool_name: str):
+        self._sources.pop(tool_name, None)
+        self._read.pop(tool_name, None)
+        if any(name == tool_name for name, _ in self._events):
+            kept = [(k, e) for k, e in zip(self._keys, self._events) if e[0] != tool_name]
+            self._keys = [k for k, _ in kept]
+            self._events = [e for _, e in kept]
+        self.event_count = len(self._keys)
 
-        def extract_timestamp(item: Dict[str, Any]) -> datetime:
-            key = next(iter(item.keys()))
-            timestamp_str = key.split("]")[0] + "]"
-            return datetime.strptime(timestamp_str, TIMESTAMP_FORMAT)
 
-        # Flatten all session lists (arm, drive, etc.)
-        combined = [
-            session
-            for session_list in sessions.values()
-            for session in session_list
+
+class ContextRenderer:
+    """
+    Renders an OrderedContext to exactly what json.dumps(..., indent=2) would give,
+    but from cached fragments: every session event is dumped once, and an impression
+    is only dumped again when its State version moves.
+    """
+    def __init__(self):
+        self._events: dict[int, str] = {}                  # event seq -> fragment
+        self._impressions: dict[str, tuple[int, str]] = {}  # tool_name -> (version, fragment)
+
+    def render(self, ordered_context: OrderedContext) -> str:
+        fields = [
+            f'  "Session": {self.render_session(ordered_context.session)}',
+            f'  "Impressions": {self.render_impressions(ordered_context.impressions, ordered_context.versions)}',
+        ]
+        for key, value in ordered_context.extras.items():
+            fields.append(f"  {json.dumps(key)}: {indented(json.dumps(value, indent=2), 1)}")
+        return "{\n" + ",\n".join(fields) + "\n}"
+
+    def render_session(self, session: List) -> str:
+        if not session:
+            return "[]"
+        fragments = [f"    {indented(self.event_fragment(event), 2)}" for event in session]
+        if len(self._events) > 2 * len(session):
+            self._evict(session)
+        return "[\n" + ",\n".join(fragments) + "\n  ]"
+
+    def render_impressions(self, impressions: dict[str, Any], versions: dict[str, int]) -> str:
+        if not impressions:
+            return "{}"
+        fragments = [
+            f"    {json.dumps(name)}: {indented(self.impression_fragment(name, impression, versions.get(name)), 2)}"
+            for name, impression in impressions.items()
         ]
+        return "{\n" + ",\n".join(fragments) + "\n  }"
+
+    def event_fragment(self, event) -> str:
+        if not isinstance(event, SessionEvent):
+            return json.dumps(event, indent=2)
+        fragment = self._events.get(event.seq)
+        if fragment is None:
+            fragment = json.dumps(event.to_dict(), indent=2)
+            self._events[event.seq] = fragment
+        return fragment
+
+    def impression_fragment(self, name: str, impression: Any, version: Optional[int]) -> str:
+        if version is None: # not backed by a State, e.g. a tool return
+            return json.dumps(impression, indent=2)
+        cached = self._impressions.get(name)
+        if cached is None or cached[0] != version:
+            cached = (version, json.dumps(impression, indent=2))
+            self._impressions[name] = cached
+        return cached[1]
+
+    def _evict(self, session: List):
+        # Drop fragments of events that were summarized away
+        live = {event.seq for event in session if isinstance(event, SessionEvent)}
+        self._events = {seq: fragment for seq, fragment in self._events.items() if seq in live}
+
+
+def indented(fragment: str, depth: int) -> str:
+    return fragment.replace("\n", "\n" + "  " * depth)
+
+
+
+CHARS_PER_TOKEN = 4 # rough, but good enough for budgeting JSON-ish prompts
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+@dataclass
+class BudgetReport:
+    budget: int
+    sections: dict[str, int] = field(default_factory=dict) # estimated tokens per section
+    events_kept: int = 0
+    events_condensed: int = 0
+    hit: bool = False
+
+class ContextBudgeter:
+    """
+    Fits an OrderedContext into a token budget. System prompt, tools, impressions and
+    extras are always kept; the newest session events are kept verbatim and whatever
+    older events don't fit are condensed into a single event.
+    """
+    def __init__(self, renderer: Optional[ContextRenderer] = None):
+        self.renderer = renderer or ContextRenderer()
+        self.runs = 0
+        self.hits = 0
+        self.events_condensed = 0
+
+    def fit(self, ordered_context: OrderedContext, budget: int, system: str = "", tools: Optional[List[dict]] = None) -> BudgetReport:
+        self.runs += 1
+        report = BudgetReport(budget=budget)
+        report.sections["system"] = estimate_tokens(system or "")
+        report.sections["tools"] = estimate_tokens(json.dumps(tools or []))
+        report.sections["impressions"] = estimate_tokens(
+            self.renderer.render_impressions(ordered_context.impressions, ordered_context.versions)
+        )
+        report.sections["extras"] = estimate_tokens(json.dumps(ordered_context.extras, indent=2)) if ordered_context.extras else 0
+
+        session = ordered_context.session
+        remaining = budget - sum(report.sections.values())
+        costs = []
+        session_tokens = 0
+        cut = len(session)
+        while cut > 0:
+            cost = self.event_tokens(session[cut - 1])
+            if session_tokens + cost > remaining and cut < len(session): # always keep the newest
+                break
+            costs.append(cost)
+            session_tokens += cost
+            cut -= 1
+
+        if cut > 0:
+            # Make room for the condensed event itself
+            condensed = self.condense(session[:cut])
+            while session_tokens + self.event_tokens(condensed) > remaining and cut < len(session) - 1:
+                session_tokens -= costs.pop()
+                cut += 1
+                condensed = self.condense(session[:cut])
+            session_tokens += self.event_tokens(condensed)
+            sources = ordered_context.sources
+            ordered_context.replace_session(
+                [condensed] + session[cut:],
+                [None] + sources[cut:] if sources is not None else None
+            )
+            report.hit = True
+            self.hits += 1
+            self.events_condensed += cut
+            print(f"[Context Budget] {cut} older events condensed to fit {budget} tokens ({self.hits}/{self.runs} runs over budget).")
+        report.events_kept = len(session) - cut
+        report.events_condensed = cut
+        report.sections["session"] = session_tokens
+        return report
+
+    def event_tokens(self, event) -> int:
+        # +2 for the indentation and separator the event picks up in the prompt
+        return estimate_tokens(self.renderer.event_fragment(event)) + 2
 
-        return sorted(combined, key=extract_timestamp)
\ No newline at end of file
+    def condense(self, events: List) -> SessionEvent:
+        labels = Counter(
+            event.label if isinstance(event, SessionEvent) else next(iter(event.keys())).split("]")[-1].strip()
+            for event in events
+        )
+        breakdown = ", ".join(f"{label or 'event'} x{count}" for label, count in labels.most_common())
+        return SessionEvent(
+            "Condensed",
+            f"{len(events)} earlier events left out to save space ({breakdown}).",
+            ns=event_time_ns(events[-1]),
+        )
@@ -0,0 +1,193 @@
+import atexit
+import json
+import os
+import queue
+import threading
+from pathlib import Path
+from typing import Any, List, Optional
+
+from vla_star.vla_complex.vla_complex_state import render_session
+
+"""
+Write-behind persistence of the complexes' States under frozen/<engine>/.
+
+    core.json             - compacted snapshot, replaced atomically. "_generation" says which journal follows it
+    journal.<gen>.jsonl   - one line per write(): only what changed since the last line
+
+Identity runs only hand a line to the writer thread. The writer appends it, and every
+JOURNAL_COMPACT_EVERY lines folds the journal into a fresh core.json.
+"""
+
+JOURNAL_COMPACT_EVERY = int(os.environ.get("JOURNAL_COMPACT_EVERY", 50))
+GENERATION_KEY = "_generation"
+
+class MemoryJournal:
+    def __init__(self, directory: Path, compact_every: int = JOURNAL_COMPACT_EVERY):
+        self.directory = Path(directory)
+        self.compact_every = compact_every
+        self.generation = 0
+        self.mirror: dict[str, dict[str, Any]] = {} # what core.json + the journal add up to
+        self.lines_since_compaction = 0
+
+        # What's been handed to the writer, per tool: (session list, events written), impression JSON
+        self._sessions: dict[str, tuple[Optional[list], int]] = {}
+        self._impressions: dict[str, tuple[int, str]] = {}
+
+        self._queue: queue.Queue = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self.lines_written = 0
+
+    def __getstate__(self):
+        # The writer thread and what it was handed belong to this process; a restored journal starts over
+        return {"directory": self.directory, "compact_every": self.compact_every}
+
+    def __setstate__(self, state):
+        self.__init__(state["directory"], state["compact_every"])
+
+    @property
+    def snapshot_path(self) -> Path:
+        return self.directory / "core.json"
+
+    def journal_path(self, generation: int) -> Path:
+        return self.directory / f"journal.{generation}.jsonl"
+
+    def load(self) -> Optional[dict[str, Any]]:
+        """
+        Snapshot plus replayed journal, in the shape of the old core.json. None if nothing was frozen.
+        """
+        found = False
+        if self.snapshot_path.exists():
+            with open(self.snapshot_path, "r") as f:
+                self.mirror = json.loads(f.read())
+            found = True
+        self.generation = self.mirror.pop(GENERATION_KEY, 0) # old core.json files have none
+        journal = self.journal_path(self.generation)
+        if journal.exists():
+            self.replay(journal)
+            found = True
+        return self.mirror if found else None
+
+    def replay(self, journal: Path):
+        """
+        Applies the journal's lines. A torn last line (a crash mid-write) is cut off the file,
+        so the next append starts on a line of its own.
+        """
+        good = 0 # bytes of whole lines
+        with open(journal, "rb") as f:
+            for line in f:
+                try:
+                    self.apply(json.loads(line))
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    break
+                good += len(line)
+                self.lines_since_compaction += 1
+                if not line.endswith(b"\n"): # whole, but its newline didn't make it
+                    with open(journal, "ab") as fix:
+                        fix.write(b"\n")
+                    good += 1
+        if good < journal.stat().st_size:
+            print(f"[Journal] Dropping torn line at the end of {journal}")
+            with open(journal, "r+b") as f:
+                f.truncate(good)
+
+    def record(self, vla_complexes: List[Any]):
+        """
+        Hands whatever changed since the last call to the writer thread
+        """
+        changes = {}
+        for vlac in vla_complexes:
+            change = self.changes(vlac.tool_name, vlac.state)
+            if change:
+                changes[vlac.tool_name] = change
+        if not changes:
+            return
+        self.start()
+        line = json.dumps({"states": changes}, default=str)
+        self._queue.put(line)
+
+    def changes(self, tool_name: str, state) -> dict[str, Any]:
+        change = {}
+        session = state.session
+        source, written = self._sessions.get(tool_name, (None, 0))
+        n = 0 if session is None else len(session) # once: events appended after this go in the next line
+        if session is None:
+            if source is not None:
+                change["session"] = None
+        elif session is not source or n < written:
+            # New, or replaced by a summary or a frozen memory: write it whole
+            change["session"] = render_session(session[:n])
+        elif n > written:
+            change["append"] = render_session(session[written:n])
+        self._sessions[tool_name] = (session, n)
+
+        version, impression_json = self._impressions.get(tool_name, (-1, None))
+        if state.version != version:
+            new_json = json.dumps(state.impression, default=str)
+            if new_json != impression_json:
+                change["impression"] = state.impression if state.impression is None else dict(state.impression)
+            self._impressions[tool_name] = (state.version, new_json)
+        return change
+
+    def apply(self, line: dict[str, Any]):
+        for tool_name, change in line["states"].items():
+            state = self.mirror.setdefault(tool_name, {"session": None, "impression": None})
+            if "session" in change:
+                state["session"] = change["session"]
+            if "append" in change:
+                state["session"] = (state["session"] or []) + change["append"]
+            if "impression" in change:
+                state["impression"] = change["impression"]
+
+    def start(self):
+        if self._writer is None:
+            self._writer = threading.Thread(target=self.write_behind, daemon=True)
+            self._writer.start()
+            atexit.register(self.close)
+
+    def write_behind(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        while True:
+            line = self._queue.get()
+            if line is None:
+                break
+            lines = [line]
+            while not self._queue.empty(): # batch whatever piled up
+                line = self._queue.get()
+                if line is None:
+                    break
+                lines.append(line)
+            with open(self.journal_path(self.generation), "a") as f:
+                f.write("".join(l + "\n" for l in lines))
+            for l in lines:
+                self.apply(json.loads(l))
+            self.lines_written += len(lines)
+            self.lines_since_compaction += len(lines)
+            if self.lines_since_compaction >= self.compact_every:
+                self.compact()
+            if line is None:
+                break
+        if self.lines_since_compaction:
+            self.compact()
+
+    def compact(self):
+        """
+        Folds the journal into core.json. A crash at any point leaves either the old snapshot and
+        its journal, or the new snapshot (whose journal starts empty).
+        """
+        generation = self.generation + 1
+        temporary = self.snapshot_path.with_suffix(".json.tmp")
+        with open(temporary, "w") as f:
+            f.write(json.dumps({**self.mirror, GENERATION_KEY: generation}))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.snapshot_path)
+        old = self.journal_path(self.generation)
+        self.generation = generation
+        self.lines_since_compaction = 0
+        if old.exists():
+            old.unlink()
+
+    def close(self):
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
@@ -0,0 +1,245 @@
+import asyncio
+import json
+import math
+import os
+import re
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Callable, List, Optional
+
+from vla_star.vla_complex.vla_complex_state import SessionEvent
+import vla_star.utilities.metrics as metrics
+
+"""
+Long-term memory under frozen/<engine>/archive.jsonl.
+
+Events that get summarized out of a session are archived here word for word, and
+indexed so the context can recall the few that matter for the current stimulus.
+With an embedding model, their vectors are kept line for line in vectors.jsonl.
+"""
+
+LONG_TERM_MEMORY_TOP_K = int(os.environ.get("LONG_TERM_MEMORY_TOP_K", 5))
+# Set to an OpenAI embedding model (e.g. text-embedding-3-small) to also recall by vector.
+# Embedding requests block, so recall() on an event loop stays lexical; archive() runs off it
+LONG_TERM_MEMORY_EMBEDDING_MODEL = os.environ.get("LONG_TERM_MEMORY_EMBEDDING_MODEL") or None
+
+TOKEN = re.compile(r"\w+")
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN.findall(text.lower())
+
+
+class BM25Index:
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: defaultdict[str, dict[int, int]] = defaultdict(dict) # term -> doc -> term frequency
+        self.lengths: List[int] = []
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def add(self, text: str) -> int:
+        doc = len(self.lengths)
+        terms = tokenize(text)
+        for term in terms:
+            self.postings[term][doc] = self.postings[term].get(doc, 0) + 1
+        self.lengths.append(len(terms))
+        self.total_length += len(terms)
+        return doc
+
+    def scores(self, query: str) -> dict[int, float]:
+        n = len(self.lengths)
+        if n == 0:
+            return {}
+        average_length = self.total_length / n or 1
+        scores: defaultdict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[doc] / average_length)
+                scores[doc] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+
+class VectorIndex:
+    def __init__(self, embed: Callable[[List[str]], List[List[float]]]):
+        self.embed = embed
+        self.vectors: List[List[float]] = [] # normalized
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def normalized(self, texts: List[str]) -> List[List[float]]:
+        """
+        Blocking: an embedding request
+        """
+        vectors = []
+        for vector in self.embed(texts):
+            norm = math.sqrt(sum(x * x for x in vector)) or 1
+            vectors.append([x / norm for x in vector])
+        return vectors
+
+    def scores(self, query_vector: List[float]) -> dict[int, float]:
+        return {
+            doc: sum(a * b for a, b in zip(vector, query_vector))
+            for doc, vector in enumerate(self.vectors)
+        }
+
+
+def openai_embedder(model: str) -> Callable[[List[str]], List[List[float]]]:
+    from vla_star.tool_choice_models.clients import sync_client
+    client = sync_client()
+    def embed(texts: List[str]) -> List[List[float]]:
+        response = client.embeddings.create(model=model, input=texts)
+        metrics.record(response.usage, model, "embedding")
+        return [item.embedding for item in response.data]
+    return embed
+
+
+class LongTermMemory:
+    def __init__(self, directory: Path, embed: Optional[Callable[[List[str]], List[List[float]]]] = None):
+        self.directory = Path(directory)
+        self.records: List[dict[str, Any]] = [] # {"tool": ..., "event": {"[timestamp] label": data}}
+        self.lexical = BM25Index()
+        if embed is None and LONG_TERM_MEMORY_EMBEDDING_MODEL:
+            embed = openai_embedder(LONG_TERM_MEMORY_EMBEDDING_MODEL)
+        self.vectors = VectorIndex(embed) if embed is not None else None
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def __getstate__(self):
+        # The index is rebuilt from the archive on first use
+        return {"directory": self.directory}
+
+    def __setstate__(self, state):
+        self.__init__(state["directory"])
+
+    @property
+    def archive_path(self) -> Path:
+        return self.directory / "archive.jsonl"
+
+    @property
+    def vectors_path(self) -> Path:
+        return self.directory / "vectors.jsonl"
+
+    def __len__(self):
+        self.load()
+        return len(self.records)
+
+    def load(self):
+        """
+        Reads the archive and the vectors saved with it. Never embeds: archive() fills in missing vectors.
+        """
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            records = self.read_jsonl(self.archive_path)
+            for record in records:
+                self.lexical.add(self.text(record))
+            self.records.extend(records)
+            if self.vectors is not None:
+                self.vectors.vectors.extend(self.read_jsonl(self.vectors_path)[:len(records)])
+
+    @staticmethod
+    def read_jsonl(path: Path) -> List[Any]:
+        if not path.exists():
+            return []
+        items = []
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    items.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break # torn last line
+        return items
+
+    def archive(self, tool_name: str, events: List[Any]):
+        """
+        Appends events (SessionEvents or old-style dicts) to the archive and the indices.
+        Blocking (files and embedding requests): call it off the event loop. Recalls only wait on the indexing.
+        """
+        if not events:
+            return
+        self.load()
+        records = []
+        for event in events:
+            items = event.to_dict() if isinstance(event, SessionEvent) else event
+            records.extend({"tool": tool_name, "event": {key: data}} for key, data in items.items())
+        texts = [self.text(record) for record in records]
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.archive_path, "a") as f:
+            f.write("".join(json.dumps(record, default=str) + "\n" for record in records))
+        with self._lock:
+            for text in texts:
+                self.lexical.add(text)
+            self.records.extend(records)
+        self.embed_missing()
+
+    def embed_missing(self):
+        """
+        Embeds the archived records that have no vector yet (all of them, for an archive older than vectors.jsonl),
+        outside the lock, and saves the vectors
+        """
+        if self.vectors is None:
+            return
+        with self._lock:
+            start = len(self.vectors)
+            texts = [self.text(record) for record in self.records[start:]]
+        if not texts:
+            return
+        vectors = self.vectors.normalized(texts)
+        with self._lock:
+            if len(self.vectors) != start: # another archive() got there first
+                return
+            with open(self.vectors_path, "a") as f:
+                f.write("".join(json.dumps(vector) + "\n" for vector in vectors))
+            self.vectors.vectors.extend(vectors)
+
+    @staticmethod
+    def text(record: dict[str, Any]) -> str:
+        key, data = next(iter(record["event"].items()))
+        return f"{record['tool']} {key} {data if isinstance(data, str) else json.dumps(data, default=str)}"
+
+    def recall(self, query: str, k: int = LONG_TERM_MEMORY_TOP_K) -> List[dict[str, Any]]:
+        """
+        Top k archived events for the query, oldest first. With a vector index, and off the event loop
+        (the query's embedding request blocks), the two rankings are fused by reciprocal rank.
+        """
+        self.load()
+        if k <= 0 or not query:
+            return []
+        query_vector = None
+        if self.vectors is not None and len(self.vectors) and not on_event_loop():
+            query_vector = self.vectors.normalized([query])[0] # outside the lock
+        with self._lock:
+            rankings = [self.lexical.scores(query)]
+            if query_vector is not None:
+                rankings.append(self.vectors.scores(query_vector))
+            fused: defaultdict[int, float] = defaultdict(float)
+            for scores in rankings:
+                ranked = sorted((doc for doc, score in scores.items() if score > 0), key=lambda doc: -scores[doc])
+                for rank, doc in enumerate(ranked):
+                    fused[doc] += 1 / (60 + rank)
+            top = sorted(fused, key=lambda doc: -fused[doc])[:k]
+            return [self.records[doc] for doc in sorted(top)]
+
+    async def recall_async(self, query: str, k: int = LONG_TERM_MEMORY_TOP_K) -> List[dict[str, Any]]:
+        """
+        recall() with the vector ranking, from a coroutine
+        """
+        return await asyncio.to_thread(self.recall, query, k)
+
+
+def on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
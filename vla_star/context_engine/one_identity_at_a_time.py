@@ -1,42 +1,133 @@
 import threading
 import asyncio
+import itertools
+import os
+from typing import List, Optional, Tuple
 
 """
 A little helper to lock in "agent identities"
+
+What happens to a rerun that arrives while an identity is running is up to the admission policy:
+    reject-new   - wait in a queue of max_waiters, reject newcomers once it's full (the old behaviour)
+    latest-wins  - once the queue is full, the oldest waiter is replaced by the newcomer
+    fifo         - like reject-new, with a deeper queue (ADMISSION_MAX_WAITERS)
+    priority     - once the queue is full, the newcomer replaces a lower (or equal) priority waiter.
+                   The highest priority waiter runs next.
 """
 
+ADMISSION_POLICIES = ("reject-new", "latest-wins", "fifo", "priority")
+ADMISSION_POLICY = os.environ.get("ADMISSION_POLICY", "reject-new")
+FIFO_MAX_WAITERS = int(os.environ.get("ADMISSION_MAX_WAITERS", 4))
+
+class RerunRejected(RuntimeError):
+    pass
+
+class RerunReplaced(RerunRejected):
+    pass
+
 class SingleIdentityRunningLock:
-    def __init__(self, max_waiters=1):
-        self._lock = asyncio.Lock()
-        self._cond = asyncio.Condition(self._lock)
-        self._active = False
-        self._waiting = 0
+    def __init__(self, max_waiters: Optional[int] = None, policy: Optional[str] = None):
+        policy = ADMISSION_POLICY if policy is None else policy
+        if policy not in ADMISSION_POLICIES:
+            raise ValueError(f"Unknown admission policy '{policy}'. Choose from {ADMISSION_POLICIES}")
+        self.policy = policy
+        if max_waiters is None:
+            max_waiters = FIFO_MAX_WAITERS if policy == "fifo" else 1
         self._max_waiters = max_waiters
+        self._active = False
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = [] # (priority, arrival, future)
+        self._arrivals = itertools.count()
 
-    async def __aenter__(self):
-        #print("Outside lock")
-        async with self._lock:
-            #print("Inside lock")
-
-            if self._active:
-                if self._waiting >= self._max_waiters:
-                    raise RuntimeError("New rerun rejected: too many waiting.")
-
-                self._waiting += 1
-                #print("Waiting for identity to finish.")
-                try:
-                    while self._active:
-                        await self._cond.wait()
-                finally:
-                    self._waiting -= 1
-            else:
-                #print("No current identity - ready to run.")
-                pass
-            self._active = True
+        self.admitted = 0 # ran right away or got a place in the queue
+        self.replaced = 0 # admitted, then pushed out of the queue
+        self.rejected = 0
+
+    def counters(self) -> dict:
+        return {
+            "policy": self.policy,
+            "admitted": self.admitted,
+            "replaced": self.replaced,
+            "rejected": self.rejected,
+            "waiting": len(self._waiters),
+        }
+
+    def admit(self, priority: int = 1) -> "Admission":
+        return Admission(self, priority)
 
+    async def __aenter__(self):
+        await self.acquire()
         return self
 
     async def __aexit__(self, exc_type, exc, tb):
-        async with self._lock:
+        self.release()
+
+    async def acquire(self, priority: int = 1):
+        self._prune()
+        if not self._active and not self._waiters:
+            #print("No current identity - ready to run.")
+            self._active = True
+            self.admitted += 1
+            return
+
+        if len(self._waiters) >= self._max_waiters:
+            victim = self._victim(priority)
+            if victim is None:
+                self.rejected += 1
+                raise RerunRejected(f"New rerun rejected: too many waiting. {self.counters()}")
+            self._waiters.remove(victim)
+            self.replaced += 1
+            victim[2].set_exception(RerunReplaced(f"Rerun replaced by a newer one. {self.counters()}"))
+
+        waiter = (priority, next(self._arrivals), asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        self.admitted += 1
+        #print("Waiting for identity to finish.")
+        try:
+            await waiter[2]
+        except asyncio.CancelledError:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            elif waiter[2].done() and not waiter[2].cancelled() and waiter[2].exception() is None:
+                self.release() # the lock was handed over just as we were cancelled
+            raise
+
+    def release(self):
+        self._prune()
+        if not self._waiters:
             self._active = False
-            self._cond.notify(1)
+            return
+        # Hand the lock straight to the next waiter so nothing can cut in
+        waiter = self._next()
+        self._waiters.remove(waiter)
+        waiter[2].set_result(None)
+
+    def _prune(self):
+        # A waiter cancelled before its task got to run is still queued with a done future
+        self._waiters = [w for w in self._waiters if not w[2].done()]
+
+    def _victim(self, priority: int):
+        if self.policy == "latest-wins":
+            return self._waiters[0]
+        if self.policy == "priority":
+            lowest = min(self._waiters, key=lambda w: (w[0], w[1]))
+            if lowest[0] <= priority:
+                return lowest
+        return None
+
+    def _next(self):
+        if self.policy == "priority":
+            return max(self._waiters, key=lambda w: (w[0], -w[1]))
+        return self._waiters[0]
+
+
+class Admission:
+    def __init__(self, lock: SingleIdentityRunningLock, priority: int):
+        self.lock = lock
+        self.priority = priority
+
+    async def __aenter__(self):
+        await self.lock.acquire(self.priority)
+        return self.lock
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.lock.release()
@@ -0,0 +1,279 @@
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, List, Optional
+
+from vla_star.context_engine.context_engine import OrderedContextLLMEngine
+from vla_star.context_engine.journal import MemoryJournal
+from vla_star.context_engine.long_term_memory import LongTermMemory
+from vla_star.vla_complex.vla_complex import VLA_Complex
+from vla_star.vla_complex.vla_complex_state import State, SessionEvent
+from vla_star.utilities import metrics
+
+"""
+Replays data/tool_choice/*.json frames (written by Dataset) through OrderedContextLLMEngine,
+with a fake model that answers with the recorded choice.
+
+    python -m vla_star.context_engine.replay data/tool_choice/<name>@<timestamp>.json [--repeat 3] [--out report.json]
+
+The states are rebuilt frame by frame (new events are appended, like live traffic), and
+context assembly, serialization and the identity run (write + model + dispatch) are timed.
+Frames recorded before "sources" was added have all their events replayed as one session.
+"""
+
+CATCH_ALL = "recorded"
+
+@dataclass
+class ReplayCall:
+    name: str
+    arguments: str
+    type: str = "function_call"
+
+@dataclass
+class ReplayResult:
+    output: List[ReplayCall]
+
+class ReplayModel:
+    """
+    Stands in for the identity's Model. Answers with whatever choices were pushed last.
+    Subclass (or pass latency) to make it behave more like a real model.
+    """
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.choices: List[ReplayCall] = []
+        self.tools = []
+        self.calls = 0
+
+    def push(self, *choices: tuple[str, str]):
+        self.choices = [ReplayCall(name=name, arguments=arguments) for name, arguments in choices]
+
+    async def run(self, input, tool_choice: Optional[str] = None):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return ReplayResult(output=list(self.choices))
+
+
+class ReplayComplex(VLA_Complex):
+    def __init__(self, tool_name: str):
+        super().__init__(tool_name)
+        self.state = State(session=[], impression=None)
+        self.dispatched: List[dict] = []
+
+    async def execute(self, **kwargs):
+        self.dispatched.append(kwargs)
+        return f"[Replay] {self.tool_name} done."
+
+@dataclass
+class ReplayTool:
+    name: str
+    tool_dict: dict
+    vla_complex: ReplayComplex
+
+
+class ReplayEngine(OrderedContextLLMEngine):
+    def __init__(self, name: str, system: str, model: ReplayModel, memory_dir: Path):
+        self.replay_dir = Path(memory_dir) # before super().__init__, which makes the metrics profile
+        super().__init__(name, construction=system, instructions="", motive="", extra="", recorded=False)
+        # Keep replays out of the agent's real frozen memory
+        self.frozen_memory_dir = Path(memory_dir)
+        self.journal = MemoryJournal(self.frozen_memory_dir)
+        self.long_term_memory = LongTermMemory(self.frozen_memory_dir)
+        self.model = model
+        self.hedge_identity = None
+        self.skip_unchanged_prompt = False # every recorded frame was a run
+
+    def metrics_profile(self) -> metrics.Profile:
+        return metrics.Profile(self.context_engine_name, directory=self.replay_dir)
+
+    def create_identity(self):
+        super().create_identity() # tools, prompt and identity cache as usual
+        self.hedge_identity = None
+        self.model.tools = self.identity.tools
+        self.identity = self.model
+
+
+@dataclass
+class ReplayReport:
+    frames: int = 0
+    timings: dict[str, List[float]] = field(default_factory=lambda: {"assemble": [], "serialize": [], "run": []})
+    context_matches: int = 0
+    choice_matches: int = 0
+
+    def summary(self) -> dict[str, Any]:
+        phases = {}
+        for phase, times in self.timings.items():
+            if not times:
+                continue
+            ordered = sorted(times)
+            phases[phase] = {
+                "total_s": sum(times),
+                "mean_ms": 1000 * statistics.fmean(times),
+                "p50_ms": 1000 * ordered[len(ordered) // 2],
+                "p95_ms": 1000 * ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+                "frames_per_s": len(times) / sum(times) if sum(times) else None,
+            }
+        return {
+            "frames": self.frames,
+            "phases": phases,
+            "context_match_rate": self.context_matches / self.frames if self.frames else None,
+            "choice_match_rate": self.choice_matches / self.frames if self.frames else None,
+        }
+
+
+def load_frames(path: Path) -> List[dict]:
+    frames = []
+    with open(path, "r") as f:
+        for line in f:
+            if line.strip():
+                frames.append(json.loads(line))
+    return frames
+
+def frame_message(frame: dict, role: str) -> Optional[str]:
+    for message in frame.get("messages", []):
+        if message["role"] == role:
+            return message["content"]
+    return None
+
+def frame_choices(frame: dict) -> List[tuple[str, str]]:
+    choices = frame.get("tool_choice_made") or []
+    if isinstance(choices, dict): # a single choice
+        choices = [choices]
+    calls = []
+    for choice in choices:
+        function = choice["function"]
+        arguments = function.get("arguments")
+        if arguments is None:
+            arguments = json.dumps(function.get("parameters") or {})
+        calls.append((function["name"], arguments))
+    return calls
+
+
+class Replayer:
+    def __init__(self, frames: List[dict], model: Optional[ReplayModel] = None, name: str = "replay", memory_dir: Optional[Path] = None):
+        self.frames = frames
+        self.model = model or ReplayModel()
+        self.memory_dir = Path(memory_dir or tempfile.mkdtemp(prefix="vla_star_replay_"))
+        first = frames[0] if frames else {}
+        self.engine = ReplayEngine(name, frame_message(first, "system") or "", self.model, self.memory_dir)
+        self.complexes: dict[str, ReplayComplex] = {}
+        self.loaded: dict[str, List[tuple]] = {} # tool -> (key, data) of the events already in its session
+        self.attach(frames)
+
+    def attach(self, frames: List[dict]):
+        tools = {}
+        for frame in frames:
+            for tool in frame.get("tools", []):
+                function = tool["function"]
+                tools[function["name"]] = {"type": "function", **function}
+        replay_tools = []
+        for name, tool_dict in tools.items():
+            self.complexes[name] = ReplayComplex(name)
+            replay_tools.append(ReplayTool(name, tool_dict, self.complexes[name]))
+        self.engine.attach_tools(replay_tools)
+
+    def complex(self, tool_name: str) -> ReplayComplex:
+        if tool_name not in self.complexes:
+            # Not offered as a tool in any frame, but it has state (or it's the catch-all)
+            self.complexes[tool_name] = ReplayComplex(tool_name)
+            self.engine.vla_complexes.append(self.complexes[tool_name])
+        return self.complexes[tool_name]
+
+    def rebuild_states(self, context: dict, sources: Optional[List[Optional[str]]]):
+        sessions: dict[str, List[tuple[int, str, Any]]] = {}
+        for i, item in enumerate(context.get("Session", [])):
+            tool_name = sources[i] if sources is not None and i < len(sources) else CATCH_ALL
+            if tool_name is None:
+                continue # a condensed stand-in, the budgeter makes its own
+            key, data = next(iter(item.items()))
+            sessions.setdefault(tool_name, []).append((i, key, data))
+
+        for tool_name in set(sessions) | set(self.loaded):
+            events = sessions.get(tool_name, [])
+            state = self.complex(tool_name).state
+            recorded = [(key, data) for _, key, data in events]
+            loaded = self.loaded.get(tool_name, [])
+            if recorded[:len(loaded)] == loaded and state.session is not None:
+                state.extend_session([self.event(*e) for e in events[len(loaded):]])
+            else: # summarized or otherwise rewritten
+                state.session = [self.event(*e) for e in events]
+            self.loaded[tool_name] = recorded
+
+        for tool_name, impression in context.get("Impressions", {}).items():
+            state = self.complex(tool_name).state
+            if state.impression != impression:
+                state.impression = dict(impression) if isinstance(impression, dict) else impression
+
+    @staticmethod
+    def event(position: int, key: str, data: Any) -> SessionEvent:
+        event = SessionEvent.from_key(key, data)
+        event.ns += position # same-second events keep their recorded order
+        return event
+
+    async def replay_frame(self, frame: dict, report: ReplayReport):
+        content = frame_message(frame, "user")
+        if content is None or (frame.get("metadata") or {}).get("suppressed"):
+            return # not an identity run
+        context = json.loads(content)
+        self.rebuild_states(context, frame.get("sources"))
+        choices = frame_choices(frame)
+        if choices:
+            self.model.push(*choices)
+
+        t0 = time.perf_counter()
+        self.engine.assemble_context(context.get("INTERNAL_MESSAGE"))
+        t1 = time.perf_counter()
+        rendered = str(self.engine.ordered_context)
+        t2 = time.perf_counter()
+        dispatched = [len(c.dispatched) for c in self.complexes.values()]
+        await self.engine.run_identity()
+        t3 = time.perf_counter()
+
+        report.frames += 1
+        report.timings["assemble"].append(t1 - t0)
+        report.timings["serialize"].append(t2 - t1)
+        report.timings["run"].append(t3 - t2)
+        report.context_matches += rendered == content
+        if choices:
+            called = [
+                c.tool_name for c, before in zip(self.complexes.values(), dispatched)
+                if len(c.dispatched) > before
+            ]
+            report.choice_matches += all(name in called for name, _ in choices)
+
+    async def replay(self) -> ReplayReport:
+        report = ReplayReport()
+        for frame in self.frames:
+            await self.replay_frame(frame, report)
+        self.engine.journal.close()
+        return report
+
+
+def replay_file(path: Path, repeat: int = 1, model: Optional[ReplayModel] = None) -> dict[str, Any]:
+    frames = load_frames(path)
+    summaries = []
+    for _ in range(repeat):
+        replayer = Replayer(frames, model=model or ReplayModel(), name=f"replay_{Path(path).stem}")
+        summaries.append(asyncio.run(replayer.replay()).summary())
+    return {"dataset": str(path), "runs": summaries}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded tool choice frames through the context engine.")
+    parser.add_argument("dataset", type=Path)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.0, help="Fake model latency in seconds.")
+    parser.add_argument("--out", type=Path, default=None)
+    args = parser.parse_args()
+
+    result = replay_file(args.dataset, args.repeat, ReplayModel(args.latency))
+    print(json.dumps(result, indent=2))
+    if args.out is not None:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
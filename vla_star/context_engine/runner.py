@@ -1,4 +1,6 @@
-import queue
+import threading
+import os
+from typing import Any, List, Optional
 
 
 
@@ -6,48 +8,114 @@ import asyncio
 import json
 from vla_star.context_engine.context_engine import OrderedContextLLMEngine
 from vla_star.utilities.displays import log, timestamp, update_activity
+from vla_star.utilities import tracing
+from vla_star.tool_choice_models import clients
+
+COALESCE_WINDOW = float(os.environ.get("RERUN_COALESCE_WINDOW", 0.05)) # seconds
 
 class ThinkingMachine:
     """ Convenience class in charge of dishing out LLM calls """
-    def __init__(self, prototype: OrderedContextLLMEngine):
-        self.reruns = queue.Queue()
+    def __init__(self, prototype: OrderedContextLLMEngine, coalesce_window: Optional[float] = None):
         self.prototype = prototype
+        self.coalesce_window = COALESCE_WINDOW if coalesce_window is None else coalesce_window
+
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.wakeup: Optional[asyncio.Event] = None
+        self.handoff = threading.Lock()
+        self.early: List[tuple] = []   # reruns from before the loop was running
+        self.sources: List[Any] = []   # reruns waiting for the next identity run
+        self.stimuli: List[tuple] = [] # (stimulus, enqueued at) of each, for tracing
 
-        self.updated = False
+        self.rerun_count = 0
+        self.identity_runs = 0
 
         self.active = False
-    
+
     def __str__(self):
-        return f"ThinkingMachine"
+        return f"ThinkingMachine({self.prototype.context_engine_name})"
 
     def rerun(self, source):
+        """
+        Safe to call from any thread
+        """
         if source == "STOP":
             self.active = False
-        
+        stimulus = tracing.current_stimulus() or tracing.next_stimulus(source)
+        enqueued = tracing.now_us()
 
         # Common Case
-        self.reruns.put(source)
-    
+        with self.handoff:
+            if self.loop is None:
+                self.early.append((source, stimulus, enqueued))
+                return
+        self.loop.call_soon_threadsafe(self.enqueue, source, stimulus, enqueued)
+
+    def enqueue(self, source, stimulus: Optional[int] = None, enqueued: float = 0.0):
+        self.rerun_count += 1
+        if source != "STOP":
+            self.sources.append(source)
+            self.stimuli.append((stimulus, enqueued))
+        self.wakeup.set()
+
     async def start(self):
         #print("Thinking Machine starting...")
-        loop = asyncio.get_running_loop()
+        self.wakeup = asyncio.Event()
+        with self.handoff:
+            self.loop = asyncio.get_running_loop()
+            early, self.early = self.early, []
         self.active = True
+        for source, stimulus, enqueued in early:
+            self.enqueue(source, stimulus, enqueued)
+        asyncio.create_task(clients.prewarm()) # alongside, so early reruns don't wait on it
+        update_activity("ThinkingMachine idle.", self)
         while self.active:
-            if not self.updated:
-                update_activity("ThinkingMachine idle.", self)
-            try:
-                source = self.reruns.get_nowait()
-                update_activity("Thinking...", self) # Never gets here (good)
-            except queue.Empty:
-                await asyncio.sleep(0.1)  # throttle
+            await self.wakeup.wait()
+            if self.coalesce_window > 0:
+                await asyncio.sleep(self.coalesce_window) # let a burst of reruns land
+            self.wakeup.clear()
+            if not self.active:
+                break
+            sources, self.sources = self.sources, []
+            stimuli, self.stimuli = self.stimuli, []
+            if not sources:
                 continue
-            #print(f"{source} runs agent!")
-            # Fire-and-forget agent
-            if type(source) == dict: # here it's a structured message - why? well only exceptions are not general context, the request()
+            update_activity("Thinking...", self)
+            #print(f"{sources} run agent!")
+            stimulus = self.trace_dequeue(stimuli)
+            message = self.merge_internal_messages(sources)
+            priority = self.prototype.source_priority(sources)
+            if self.prototype.preempt(priority, message):
+                tracing.tracer.instant("preempted_inflight_run", stimulus)
+                continue # the in-flight run restarts with fresh context instead
+            # Fire-and-forget agent - one identity run for the whole burst
+            self.identity_runs += 1
+            token = tracing.set_stimulus(stimulus) # the task's spans belong to this stimulus
+            asyncio.create_task(self.prototype.request(message, priority))
+            tracing.reset_stimulus(token)
+            update_activity("ThinkingMachine idle.", self)
+        #print(f"Thinking Machine ending.")
+
+    def trace_dequeue(self, stimuli: List[tuple]) -> Optional[int]:
+        """
+        Records how long each stimulus queued. The burst runs as the first one.
+        """
+        dequeued = tracing.now_us()
+        primary = next((stimulus for stimulus, _ in stimuli if stimulus is not None), None)
+        for stimulus, enqueued in stimuli:
+            tracing.tracer.record("queued", enqueued, dequeued, stimulus)
+            if stimulus != primary:
+                tracing.tracer.instant("coalesced", stimulus, into=primary)
+        return primary
+
+    def merge_internal_messages(self, sources: List[Any]) -> Optional[str]:
+        # here it's a structured message - why? well only exceptions are not general context, the request()
+        messages = []
+        for source in sources:
+            if type(source) == dict:
                 try:
-                    asyncio.create_task(self.prototype.request(source["INTERNAL_MESSAGE"]))
+                    messages.append(source["INTERNAL_MESSAGE"])
                 except KeyError as e:
                     raise Exception(f"Internal message '{source}' not supported.")
-                continue    
-            asyncio.create_task(self.prototype.request())
-        #print(f"Thinking Machine ending.")
\ No newline at end of file
+        if not messages:
+            return None
+        return "\n".join(str(message) for message in messages)
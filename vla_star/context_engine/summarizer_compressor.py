@@ -1,11 +1,44 @@
-from vla_star.vla_complex.vla_complex_state import State
-from typing import List
+from vla_star.vla_complex.vla_complex_state import State, SessionEvent, render_session
+from typing import List, Optional
+from collections import OrderedDict
+import hashlib
 import json
+import os
 from agents import Agent, Runner
 from pydantic import BaseModel
+from dataclasses import dataclass, field
 
 from vla_star.tool_choice_models.output_types import SummarizedSessions
 from vla_star.tool_choice_models.model_purveyor import ModelPurveyor
+import vla_star.utilities.metrics as metrics
+
+@dataclass
+class SessionSnapshot:
+    """
+    Copies of the states taken when a summary starts, plus what they were copied from,
+    so the result can be swapped in without losing events that arrived meanwhile.
+    """
+    states: dict[str, State] = field(default_factory=dict)
+    sources: dict[str, list] = field(default_factory=dict)
+    lengths: dict[str, int] = field(default_factory=dict)
+    digests: dict[str, int] = field(default_factory=dict) # leading events that are a previous summary
+    summarized: set[str] = field(default_factory=set)     # tools actually sent to the summarizer
+
+    @classmethod
+    def take(cls, vla_complexes, digests: Optional[dict[str, int]] = None) -> "SessionSnapshot":
+        snapshot = cls(digests=dict(digests or {}))
+        for vla_complex in vla_complexes:
+            state = vla_complex.state
+            session = state.session
+            copied = list(session) if session is not None else None
+            impression = dict(state.impression) if isinstance(state.impression, dict) else state.impression
+            snapshot.states[vla_complex.tool_name] = State(session=copied, impression=impression)
+            if session is not None:
+                snapshot.sources[vla_complex.tool_name] = session
+                snapshot.lengths[vla_complex.tool_name] = len(copied)
+        return snapshot
+
+SUMMARY_CACHE_SIZE = 64
 
 class Summarizer:
     """
@@ -15,15 +48,80 @@ class Summarizer:
         self.identities_cnt = 0
         self.model = "o4-mini"
         self.identity = None
+        # tool_name -> (session list the summary was swapped into, length of that summary)
+        self.checkpoints: dict[str, tuple[list, int]] = {}
+        self.cache: OrderedDict[str, SummarizedSessions] = OrderedDict()
+        self.cache_hits = 0
+        self.min_new_events = int(os.environ.get("SUMMARIZE_MIN_NEW_EVENTS", 5))
+        self.profile: Optional[metrics.Profile] = None # the agent's, set by its engine
 
-    async def compress_all_states(self, vla_complexes) -> dict[str, State]:
-        states: dict[str, State] = State.form_map_from_vlac_name_to_vlac_state(vla_complexes)
-        edible = State.states_to_json(states)
+    async def compress_snapshot(self, snapshot: SessionSnapshot) -> SummarizedSessions:
+        """
+        Sends only events newer than each tool's last summary, plus that summary
+        """
+        prompt = self.incremental_prompt(snapshot)
+        if prompt is None:
+            return SummarizedSessions(sessions=[])
+        return await self.cached_run(prompt)
+
+    def incremental_prompt(self, snapshot: SessionSnapshot) -> Optional[str]:
+        edible = {}
+        for tool_name, state in snapshot.states.items():
+            if not state.session:
+                continue
+            digest = snapshot.digests.get(tool_name, 0)
+            if digest >= len(state.session):
+                continue
+            edible[tool_name] = {
+                "previous_summary": render_session(state.session[:digest]),
+                "new_events": render_session(state.session[digest:]),
+                "impression": state.impression,
+            }
+            snapshot.summarized.add(tool_name)
+        if not edible:
+            return None
+        return json.dumps(edible)
+
+    async def cached_run(self, prompt: str) -> SummarizedSessions:
+        instructions = self.instance_system_prompt()
+        key = hashlib.sha256(f"{ModelPurveyor.SUMMARIZER_MODEL_STRING}\n{instructions}\n{prompt}".encode("utf-8")).hexdigest()
+        if key in self.cache:
+            self.cache_hits += 1
+            self.cache.move_to_end(key)
+            print(f"[Summarizer] Summary cache hit ({self.cache_hits} so far).")
+            return self.cache[key]
         self.create_identity()
-        return await self.run_identity(edible)
+        result = await self.run_identity(prompt)
+        self.cache[key] = result
+        if len(self.cache) > SUMMARY_CACHE_SIZE:
+            self.cache.popitem(last=False)
+        return result
+
+    def snapshot(self, vla_complexes) -> SessionSnapshot:
+        return SessionSnapshot.take(vla_complexes, {
+            vla_complex.tool_name: self.digest_length(vla_complex)
+            for vla_complex in vla_complexes
+        })
 
+    def digest_length(self, vla_complex) -> int:
+        checkpoint = self.checkpoints.get(vla_complex.tool_name)
+        session = vla_complex.state.session
+        if checkpoint is None or session is None or checkpoint[0] is not session:
+            return 0 # e.g. loaded from frozen memory: everything counts as new
+        return min(checkpoint[1], len(session))
 
-    def update_vla_complexes(self, vla_complexes, states: SummarizedSessions):
+    def pending_event_count(self, vla_complexes) -> int:
+        return sum(
+            len(vla_complex.state.session) - self.digest_length(vla_complex)
+            for vla_complex in vla_complexes
+            if vla_complex.state.session
+        )
+
+    def update_vla_complexes(self, vla_complexes, states: SummarizedSessions, snapshot: Optional[SessionSnapshot] = None) -> set[str]:
+        """
+        Returns the tools whose sessions got their summary
+        """
+        updated = set()
         session_by_tool = {
             tool_session.tool_name: tool_session.session
             for tool_session in states.sessions
@@ -33,10 +131,27 @@ class Summarizer:
             session = session_by_tool.get(vla_complex.tool_name)
             if session is not None:
                 #Session(events=[Event(timestamp_label='[2026-02-07 14:19:42]', data_or_summary='picked up breakfast')])
-                vla_complex.state.session = []
-                for event in session.events:
-                    rephrased = {event.timestamp_label: event.data_or_summary}
-                    vla_complex.state.session.append(rephrased)
+                summarized = [
+                    SessionEvent.from_key(event.timestamp_label, event.data_or_summary)
+                    for event in session.events
+                ]
+                if snapshot is None:
+                    vla_complex.state.session = summarized
+                elif vla_complex.tool_name in snapshot.summarized:
+                    # Events that arrived while summarizing stay on after the summary
+                    swapped = vla_complex.state.swap_session_prefix(
+                        snapshot.sources[vla_complex.tool_name],
+                        snapshot.lengths[vla_complex.tool_name],
+                        summarized
+                    )
+                    if not swapped:
+                        print(f"[Summarizer] {vla_complex.tool_name} session was replaced while summarizing. Dropping its summary.")
+                        continue
+                else:
+                    continue
+                self.checkpoints[vla_complex.tool_name] = (vla_complex.state.session, len(summarized))
+                updated.add(vla_complex.tool_name)
+        return updated
 
     
     
@@ -50,6 +165,7 @@ class Summarizer:
     async def run_identity(self, prompt):
         print(f"Summarizing... \n")
         result = await ModelPurveyor.remember(self.identity, prompt)
+        metrics.record(result.context_wrapper.usage, ModelPurveyor.SUMMARIZER_MODEL_STRING, "summarizer", self.profile)
         print(f"end.")
         return result.final_output
     
@@ -68,6 +184,8 @@ If data is already readable, it's because its already summarized. Since the data
 
 All data must have a timestamp of the form f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]" or [%Y-%m-%d %H:%M:%S], e.g. [2026-02-07 11:41:54]. For periods of time, of course pick a single reasonable moment. This all must be intuitively understandable. No ranges, just 
 
+The data is given per tool as "previous_summary" (your own earlier summary of that tool's session, possibly empty) and "new_events" (what happened since). For every tool given, output one session that covers both: keep the previous summary consistent and fold the new events into it.
+
 Identify with the "self" character in the chat history. You are the robot, summarizing your past, in order to be persistent in the world.
 
 Above all, output form must match the requested output type, a SummarizedSessions pydantic object.
@@ -0,0 +1,88 @@
+import asyncio
+import os
+import threading
+import weakref
+from typing import Optional
+
+from openai import AsyncOpenAI, OpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient
+from agents import RunConfig, OpenAIProvider, set_default_openai_client
+
+"""
+The OpenAI clients everything shares: the identity, the summarizer and introducer (Agents SDK),
+the VLM, audio and embeddings. Pooled and keep-alive, so calls reuse warm connections
+instead of paying a TLS handshake each.
+
+    async_client()  - for coroutines. One per event loop, since connections belong to the loop that opened them
+    sync_client()   - for code without a loop (the chat client's audio, embeddings). Thread safe
+    run_config()    - makes Runner.run use async_client()
+    prewarm()       - opens OPENAI_PREWARM_CONNECTIONS connections, at agent start
+
+Both read OPENAI_BASE_URL and OPENAI_API_KEY like any OpenAI client.
+"""
+
+OPENAI_MAX_CONNECTIONS = int(os.environ.get("OPENAI_MAX_CONNECTIONS", 100))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("OPENAI_MAX_KEEPALIVE_CONNECTIONS", 20))
+OPENAI_KEEPALIVE_EXPIRY = float(os.environ.get("OPENAI_KEEPALIVE_EXPIRY", 120.0)) # seconds an idle connection is kept
+OPENAI_TIMEOUT = float(os.environ.get("OPENAI_TIMEOUT", 120.0))
+OPENAI_MAX_RETRIES = int(os.environ.get("OPENAI_MAX_RETRIES", 2))
+OPENAI_PREWARM_CONNECTIONS = int(os.environ.get("OPENAI_PREWARM_CONNECTIONS", 2))
+
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = weakref.WeakKeyDictionary()
+_prewarmed: "weakref.WeakSet[asyncio.AbstractEventLoop]" = weakref.WeakSet()
+_sync_client: Optional[OpenAI] = None
+_lock = threading.Lock()
+
+def limits():
+    import httpx # what the openai clients are built on
+    return httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+    )
+
+def async_client() -> AsyncOpenAI:
+    """
+    The running loop's client. Also made the Agents SDK's default.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = AsyncOpenAI(
+            timeout=OPENAI_TIMEOUT,
+            max_retries=OPENAI_MAX_RETRIES,
+            http_client=DefaultAsyncHttpxClient(limits=limits()),
+        )
+        _async_clients[loop] = client
+        set_default_openai_client(client, use_for_tracing=False)
+    return client
+
+def sync_client() -> OpenAI:
+    global _sync_client
+    with _lock:
+        if _sync_client is None:
+            _sync_client = OpenAI(
+                timeout=OPENAI_TIMEOUT,
+                max_retries=OPENAI_MAX_RETRIES,
+                http_client=DefaultHttpxClient(limits=limits()),
+            )
+        return _sync_client
+
+def run_config() -> RunConfig:
+    return RunConfig(model_provider=OpenAIProvider(openai_client=async_client()))
+
+async def prewarm(connections: int = OPENAI_PREWARM_CONNECTIONS):
+    """
+    Opens connections ahead of the first model call, once per loop. Failures only cost the warm start.
+    """
+    loop = asyncio.get_running_loop()
+    if connections <= 0 or loop in _prewarmed:
+        return
+    _prewarmed.add(loop)
+    client = async_client()
+    # Concurrent, so each one takes its own connection; listing models is free
+    results = await asyncio.gather(*(client.models.list() for _ in range(connections)), return_exceptions=True)
+    failures = [result for result in results if isinstance(result, Exception)]
+    if failures:
+        print(f"[Clients] Pre-warming {client.base_url} failed: {failures[0]}")
+    else:
+        print(f"[Clients] Pre-warmed {connections} connections to {client.base_url}")
@@ -0,0 +1,467 @@
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, List, Optional
+
+"""
+A local stand-in for the OpenAI API, for load testing the agent loop offline.
+
+    python -m vla_star.tool_choice_models.mock_server --port 8765 --latency lognormal:-0.5,0.4 --error-rate 0.02
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=mock OPENAI_AGENTS_DISABLE_TRACING=1 python -m start_scripts.start Mike
+
+Every OpenAI client in the repo (the identity's Model, the Agents SDK summarizer and introducer,
+the VLM, audio and embeddings) reads OPENAI_BASE_URL, so pointing it here is all it takes.
+
+    POST /v1/responses              a function_call to one of the offered tools (or a message, see
+                                    --message-rate); structured output when a json_schema is asked for.
+                                    Streamed when asked, with --stream-tail after the last item
+    POST /v1/chat/completions       a text reply, tool_calls when tools are offered
+    POST /v1/audio/speech           a short silent WAV
+    POST /v1/audio/transcriptions   a scripted or random transcript
+    POST /v1/embeddings             deterministic pseudo-random vectors
+    GET  /v1/models                 for pre-warming connections
+
+Tool calls are random (arguments generated from the tool's JSON schema) unless --script gives a
+JSONL of choices to cycle through: {"tool": name, "arguments": {...}}, {"calls": [{"tool": ...}, ...]}
+(parallel tool calls) or {"text": "..."} per line. A recorded Dataset (data/tool_choice/*.json) works
+too: its tool_choice_made are replayed.
+"""
+
+DEFAULT_PORT = 8765
+
+@dataclass
+class Latency:
+    """
+    fixed:S | uniform:LOW,HIGH | normal:MEAN,STD | lognormal:MU,SIGMA | exponential:MEAN (seconds)
+    """
+    kind: str = "fixed"
+    params: tuple = (0.0,)
+
+    @classmethod
+    def parse(cls, spec: str) -> "Latency":
+        kind, _, params = spec.partition(":")
+        latency = cls(kind, tuple(float(p) for p in params.split(",") if p) or (0.0,))
+        latency.sample(random.Random(0)) # fail now on a bad spec
+        return latency
+
+    def sample(self, rng: random.Random) -> float:
+        match self.kind:
+            case "fixed":
+                return self.params[0]
+            case "uniform":
+                return rng.uniform(*self.params)
+            case "normal":
+                return max(0.0, rng.gauss(*self.params))
+            case "lognormal":
+                return rng.lognormvariate(*self.params)
+            case "exponential":
+                return rng.expovariate(1 / self.params[0]) if self.params[0] else 0.0
+            case _:
+                raise ValueError(f"Unknown latency distribution {self.kind!r}")
+
+@dataclass
+class MockConfig:
+    latency: Latency = field(default_factory=Latency)
+    endpoint_latency: dict[str, Latency] = field(default_factory=dict) # e.g. "responses" -> Latency
+    error_rate: float = 0.0
+    error_status: int = 500
+    message_rate: float = 0.0 # Responses that are a message instead of a function_call
+    parallel_rate: float = 0.0 # Random tool calls that come two at a time, when parallel_tool_calls allows
+    stream_tail: float = 0.0  # seconds a stream goes on after its last output item, like a reasoning model's
+    script: List[dict] = field(default_factory=list)
+    seed: Optional[int] = None
+
+    def latency_for(self, endpoint: str) -> Latency:
+        return self.endpoint_latency.get(endpoint, self.latency)
+
+
+def load_script(path: Path) -> List[dict]:
+    choices = []
+    with open(path, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if "messages" in item: # a Dataset frame
+                made = item.get("tool_choice_made") or []
+                calls = []
+                for choice in made if isinstance(made, list) else [made]:
+                    function = choice["function"]
+                    arguments = function.get("arguments")
+                    arguments = json.loads(arguments) if arguments is not None else function.get("parameters") or {}
+                    calls.append({"tool": function["name"], "arguments": arguments})
+                if calls:
+                    choices.append(calls[0] if len(calls) == 1 else {"calls": calls})
+            else:
+                choices.append(item)
+    return choices
+
+
+class SchemaFaker:
+    """
+    Makes up an instance of a JSON schema. Enough of the spec for function parameters and pydantic output types.
+    """
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+
+    def fake(self, schema: dict, root: Optional[dict] = None, depth: int = 0) -> Any:
+        root = root or schema
+        if "$ref" in schema:
+            target = root
+            for part in schema["$ref"].lstrip("#/").split("/"):
+                target = target[part]
+            return self.fake(target, root, depth + 1)
+        for combinator in ("anyOf", "oneOf"):
+            if combinator in schema:
+                return self.fake(self.rng.choice(schema[combinator]), root, depth + 1)
+        if "allOf" in schema:
+            return self.fake(schema["allOf"][0], root, depth + 1)
+        if "enum" in schema:
+            return self.rng.choice(schema["enum"])
+        if "const" in schema:
+            return schema["const"]
+        kind = schema.get("type", "object" if "properties" in schema else "string")
+        if isinstance(kind, list):
+            kind = self.rng.choice([k for k in kind if k != "null"] or ["null"])
+        match kind:
+            case "object":
+                return {
+                    name: self.fake(prop, root, depth + 1)
+                    for name, prop in schema.get("properties", {}).items()
+                }
+            case "array":
+                count = 0 if depth > 6 else self.rng.randint(schema.get("minItems", 0), max(schema.get("minItems", 0), 2))
+                return [self.fake(schema.get("items", {}), root, depth + 1) for _ in range(count)]
+            case "integer":
+                return self.rng.randint(schema.get("minimum", 0), schema.get("maximum", 100))
+            case "number":
+                return round(self.rng.uniform(schema.get("minimum", 0.0), schema.get("maximum", 100.0)), 3)
+            case "boolean":
+                return self.rng.random() < 0.5
+            case "null":
+                return None
+            case _:
+                return self.words(self.rng.randint(1, 6))
+
+    def words(self, count: int) -> str:
+        return " ".join(self.rng.choice(WORDS) for _ in range(count))
+
+WORDS = "okay moving to the table picking up cup hello there I see a door on my left done waiting".split()
+
+
+def tokens(payload: Any) -> int:
+    text = payload if isinstance(payload, str) else json.dumps(payload, default=str)
+    return max(1, len(text) // 4)
+
+def new_id(prefix: str) -> str:
+    return f"{prefix}_{uuid.uuid4().hex[:24]}"
+
+class MockOpenAI:
+    """
+    Builds the responses. Thread safe: the server runs a handler thread per request.
+    """
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.faker = SchemaFaker(self.rng)
+        self.script = itertools.cycle(config.script) if config.script else None
+        self.lock = threading.Lock()
+        self.counts: dict[str, int] = {}
+
+    def delay(self, endpoint: str) -> tuple[float, bool]:
+        """
+        (latency to wait, whether to fail)
+        """
+        with self.lock:
+            self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+            return self.config.latency_for(endpoint).sample(self.rng), self.rng.random() < self.config.error_rate
+
+    def next_choice(self, tools: List[dict], required: bool = False, parallel: bool = True) -> dict:
+        """
+        required (tool_choice="required") rules out messages, scripted or not.
+        Returns {"text": ...} or {"calls": [{"tool": ..., "arguments": ...}, ...]}, only one call unless parallel.
+        """
+        with self.lock:
+            if self.script is not None:
+                choice = next(self.script)
+                calls = choice.get("calls") or ([choice] if "tool" in choice else [])
+                if calls:
+                    return {"calls": calls if parallel else calls[:1]}
+                if not (required and tools):
+                    return choice
+            if not tools or (not required and self.rng.random() < self.config.message_rate):
+                return {"text": self.faker.words(self.rng.randint(3, 12))}
+            count = 2 if parallel and len(tools) > 1 and self.rng.random() < self.config.parallel_rate else 1
+            return {"calls": [
+                {"tool": tool["name"], "arguments": self.faker.fake(tool.get("parameters") or {})}
+                for tool in self.rng.sample(tools, count)
+            ]}
+
+    def fake_output(self, schema: dict) -> str:
+        with self.lock:
+            return json.dumps(self.faker.fake(schema))
+
+    def usage(self, request: dict, output: Any) -> dict:
+        return {"input_tokens": tokens(request), "output_tokens": tokens(output)}
+
+    def responses(self, request: dict) -> dict:
+        output_format = (request.get("text") or {}).get("format") or {}
+        tools = [tool for tool in request.get("tools") or [] if tool.get("type") == "function"]
+        if output_format.get("type") == "json_schema":
+            choice = {"text": self.fake_output(output_format.get("schema") or {})}
+        else:
+            choice = self.next_choice(tools, request.get("tool_choice") == "required", request.get("parallel_tool_calls", True))
+        if "calls" in choice:
+            output = [{
+                "type": "function_call", "id": new_id("fc"), "call_id": new_id("call"), "status": "completed",
+                "name": call["tool"], "arguments": json.dumps(call.get("arguments") or {}),
+            } for call in choice["calls"]]
+        else:
+            output = [{
+                "type": "message", "id": new_id("msg"), "role": "assistant", "status": "completed",
+                "content": [{"type": "output_text", "text": choice["text"], "annotations": []}],
+            }]
+        usage = self.usage(request, output)
+        return {
+            "id": new_id("resp"), "object": "response", "created_at": int(time.time()), "status": "completed",
+            "model": request.get("model", "mock"), "output": output,
+            "parallel_tool_calls": request.get("parallel_tool_calls", True),
+            "tool_choice": request.get("tool_choice", "auto"), "tools": request.get("tools") or [],
+            "usage": {
+                **usage, "total_tokens": usage["input_tokens"] + usage["output_tokens"],
+                "input_tokens_details": {"cached_tokens": 0}, "output_tokens_details": {"reasoning_tokens": 0},
+            },
+        }
+
+    def chat_completions(self, request: dict) -> dict:
+        tools = [tool["function"] for tool in request.get("tools") or [] if tool.get("type") == "function"]
+        response_format = request.get("response_format") or {}
+        message: dict[str, Any] = {"role": "assistant", "content": None}
+        finish_reason = "stop"
+        if response_format.get("type") == "json_schema":
+            message["content"] = self.fake_output(response_format["json_schema"].get("schema") or {})
+        else:
+            choice = self.next_choice(tools, request.get("tool_choice") == "required", request.get("parallel_tool_calls", True))
+            if "calls" in choice:
+                message["tool_calls"] = [{
+                    "id": new_id("call"), "type": "function",
+                    "function": {"name": call["tool"], "arguments": json.dumps(call.get("arguments") or {})},
+                } for call in choice["calls"]]
+                finish_reason = "tool_calls"
+            else:
+                message["content"] = choice["text"]
+        usage = self.usage(request, message)
+        return {
+            "id": new_id("chatcmpl"), "object": "chat.completion", "created": int(time.time()),
+            "model": request.get("model", "mock"),
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": {
+                "prompt_tokens": usage["input_tokens"], "completion_tokens": usage["output_tokens"],
+                "total_tokens": usage["input_tokens"] + usage["output_tokens"],
+            },
+        }
+
+    def embeddings(self, request: dict) -> dict:
+        inputs = request.get("input")
+        inputs = [inputs] if isinstance(inputs, str) else inputs or []
+        dimensions = request.get("dimensions") or 64
+        data = []
+        for i, text in enumerate(inputs):
+            rng = random.Random(str(text)) # same text, same vector
+            data.append({"object": "embedding", "index": i, "embedding": [rng.uniform(-1, 1) for _ in range(dimensions)]})
+        return {
+            "object": "list", "data": data, "model": request.get("model", "mock"),
+            "usage": {"prompt_tokens": tokens(inputs), "total_tokens": tokens(inputs)},
+        }
+
+    def transcript(self) -> str:
+        choice = self.next_choice([])
+        return choice.get("text") or self.faker.words(5)
+
+def silent_wav(seconds: float = 0.25, sample_rate: int = 24000) -> bytes:
+    frames = int(seconds * sample_rate)
+    data = b"\x00\x00" * frames
+    header = b"RIFF" + (36 + len(data)).to_bytes(4, "little") + b"WAVEfmt " + (16).to_bytes(4, "little")
+    header += (1).to_bytes(2, "little") + (1).to_bytes(2, "little") + sample_rate.to_bytes(4, "little")
+    header += (2 * sample_rate).to_bytes(4, "little") + (2).to_bytes(2, "little") + (16).to_bytes(2, "little")
+    return header + b"data" + len(data).to_bytes(4, "little") + data
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    mock: MockOpenAI
+    protocol_version = "HTTP/1.1" # keep-alive, like the real API
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0].rstrip("/") != "/v1/models":
+            return self.send_json(404, {"error": {"message": f"Mock server has no {self.path}", "type": "invalid_request_error", "code": None}})
+        self.send_json(200, {"object": "list", "data": [{"id": "mock", "object": "model", "created": 0, "owned_by": "mock"}]})
+
+    def do_POST(self):
+        path = self.path.split("?")[0].rstrip("/")
+        endpoint = path.removeprefix("/v1/")
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        routes = {
+            "responses": self.json_route(self.mock.responses, self.stream_response),
+            "chat/completions": self.json_route(self.mock.chat_completions),
+            "embeddings": self.json_route(self.mock.embeddings),
+            "audio/speech": self.speech,
+            "audio/transcriptions": self.transcription,
+        }
+        if endpoint not in routes:
+            return self.send_json(404, {"error": {"message": f"Mock server has no {path}", "type": "invalid_request_error", "code": None}})
+
+        latency, fail = self.mock.delay(endpoint)
+        time.sleep(latency)
+        if fail:
+            status = self.mock.config.error_status
+            return self.send_json(status, {"error": {"message": f"Mock {status}", "type": "server_error", "code": None}})
+        try:
+            routes[endpoint](body)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True # the client hung up, e.g. a cancelled stream
+        except Exception as e:
+            self.send_json(400, {"error": {"message": f"Mock server could not answer: {e}", "type": "invalid_request_error", "code": None}})
+
+    def json_route(self, build, stream=None):
+        def route(body: bytes):
+            request = json.loads(body or b"{}")
+            if not request.get("stream"):
+                return self.send_json(200, build(request))
+            if stream is None:
+                raise ValueError("streaming isn't mocked here")
+            stream(build(request))
+        return route
+
+    def stream_response(self, response: dict):
+        """
+        Server-sent events, in the order the Responses API sends them
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        sequence = itertools.count()
+        def event(kind: str, **fields):
+            data = json.dumps({"type": kind, "sequence_number": next(sequence), **fields})
+            self.send_chunk(f"event: {kind}\ndata: {data}\n\n".encode("utf-8"))
+
+        output = response["output"]
+        event("response.created", response={**response, "status": "in_progress", "output": [], "usage": None})
+        for index, item in enumerate(output):
+            event("response.output_item.added", output_index=index, item={**item, "status": "in_progress"})
+            if item["type"] == "function_call":
+                event("response.function_call_arguments.delta", output_index=index, item_id=item["id"], delta=item["arguments"])
+                event("response.function_call_arguments.done", output_index=index, item_id=item["id"], arguments=item["arguments"])
+            event("response.output_item.done", output_index=index, item=item)
+        if self.mock.config.stream_tail:
+            time.sleep(self.mock.config.stream_tail)
+        event("response.completed", response=response)
+        self.send_chunk(b"")
+
+    def send_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def speech(self, body: bytes):
+        self.send_bytes(200, silent_wav(), "audio/wav")
+
+    def transcription(self, body: bytes):
+        text = self.mock.transcript()
+        if b'name="response_format"\r\n\r\ntext' in body:
+            return self.send_bytes(200, text.encode("utf-8"), "text/plain")
+        self.send_json(200, {"text": text, "usage": {"type": "tokens", "input_tokens": 50, "output_tokens": tokens(text), "total_tokens": 50 + tokens(text)}})
+
+    def send_json(self, status: int, payload: dict):
+        self.send_bytes(status, json.dumps(payload).encode("utf-8"), "application/json")
+
+    def send_bytes(self, status: int, data: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class MockServer:
+    """
+    In-process server, for tests and benchmarks:
+
+        with MockServer(MockConfig(latency=Latency.parse("uniform:0.1,0.3"))) as base_url:
+            os.environ["OPENAI_BASE_URL"] = base_url
+    """
+    def __init__(self, config: Optional[MockConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.mock = MockOpenAI(config or MockConfig())
+        handler = type("BoundMockHandler", (MockHandler,), {"mock": self.mock})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> str:
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> str:
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible mock server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", type=Latency.parse, default=Latency(), help="Default latency, e.g. lognormal:-0.5,0.4")
+    parser.add_argument("--endpoint-latency", action="append", default=[], metavar="ENDPOINT=SPEC", help="e.g. responses=uniform:0.5,2")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500, help="e.g. 429 to exercise the clients' retries")
+    parser.add_argument("--message-rate", type=float, default=0.0, help="Fraction of responses that are a message, not a tool call.")
+    parser.add_argument("--parallel-rate", type=float, default=0.0, help="Fraction of random tool calls that come in pairs.")
+    parser.add_argument("--stream-tail", type=float, default=0.0, help="Seconds streams go on after their last output item.")
+    parser.add_argument("--script", type=Path, default=None, help="JSONL of choices, or a recorded Dataset.")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = MockConfig(
+        latency=args.latency,
+        endpoint_latency={
+            endpoint: Latency.parse(spec)
+            for endpoint, spec in (item.split("=", 1) for item in args.endpoint_latency)
+        },
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        message_rate=args.message_rate,
+        parallel_rate=args.parallel_rate,
+        stream_tail=args.stream_tail,
+        script=load_script(args.script) if args.script else [],
+        seed=args.seed,
+    )
+    server = MockServer(config, args.host, args.port)
+    print(f"[MockServer] Serving on {server.base_url}. Set OPENAI_BASE_URL={server.base_url}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server.server_close()
@@ -2,72 +2,416 @@
 Purveys models from model providers, according to the methods herein, according to the env variable.
 """
 from agents import Agent, Runner
-from typing import List
+from typing import List, Optional, Callable
+from dataclasses import dataclass
 import os
+import time
+import asyncio
 from vla_star.tool_choice_models.output_types import SummarizedSessions
 import json
 from vla_star.tool_choice_models.models_interface import Model
+from vla_star.tool_choice_models import clients
+from vla_star.utilities import tracing, metrics
 
 IDENTITY_MODEL_STRING = os.environ.get("MOMENT_MODEL_STRING", "o4-mini")
 SUMMARIZER_MODEL_STRING = os.environ.get("MEMORY_MODEL_STRING", "o4-mini")
 INTRODUCER_MODEL_STRING = os.environ.get("INTRODUCER_MODEL_STRING", "o4-mini")
+# A second identity model that races the first. Launched HEDGE_DELAY seconds in (0 = right away)
+HEDGE_MODEL_STRING = os.environ.get("HEDGE_MODEL_STRING") or None
+HEDGE_DELAY = float(os.environ.get("HEDGE_DELAY", 0.0))
+# Model requests per identity run before giving up. Retries force a tool call
+IDENTITY_MAX_ATTEMPTS = int(os.environ.get("IDENTITY_MAX_ATTEMPTS", 3))
+IDENTITY_RETRY_BACKOFF = float(os.environ.get("IDENTITY_RETRY_BACKOFF", 0.0)) # seconds before the first retry, doubling
+# Tool called (with the model's last message) when the attempts run out. Unset: nothing is dispatched
+FALLBACK_TOOL = os.environ.get("FALLBACK_TOOL") or None
+# Stream identity responses and dispatch as soon as a function call is complete
+IDENTITY_STREAMING = os.environ.get("IDENTITY_STREAMING", "0") == "1"
+# Let the identity call several tools in one response. They're dispatched concurrently, except that
+# calls to tools in the same TOOL_ORDERING group run one after another, in the order they were made.
+# Every tool is its own group unless mapped, e.g. {"arm": "body", "drive": "body", "endgame": "*"}.
+# "*" runs alone: after everything called before it, and before everything called after it
+PARALLEL_TOOL_CALLS = os.environ.get("PARALLEL_TOOL_CALLS", "1") == "1"
+TOOL_ORDERING: dict[str, str] = json.loads(os.environ.get("TOOL_ORDERING") or "{}")
+EXCLUSIVE = "*"
+
+# Token budget for the identity's prompt (system + tools + context), per model
+CONTEXT_TOKEN_BUDGETS = {
+    "o4-mini": 24000,
+    "claude-sonnet-4-20250514": 24000,
+    "deepseek-chat": 12000,
+}
+DEFAULT_CONTEXT_TOKEN_BUDGET = 16000
 
 #from agents.extensions.models.litellm_model import LitellmModel
 
+@dataclass
+class FallbackCall:
+    """
+    Looks like a function_call from the model
+    """
+    name: str
+    arguments: str
+    type: str = "function_call"
+
+class ToolCallDispatch:
+    """
+    Dispatches function calls as they're submitted, each in its own task, ordered per TOOL_ORDERING
+    """
+    def __init__(self, tool_dispatcher: dict, on_dispatch: Optional[Callable] = None, ordering: Optional[dict[str, str]] = None):
+        self.tool_dispatcher = tool_dispatcher
+        self.on_dispatch = on_dispatch
+        self.ordering = TOOL_ORDERING if ordering is None else ordering
+        self.tasks: List[asyncio.Task] = []
+        self.last_in_group: dict[str, asyncio.Task] = {}
+        self.exclusive: Optional[asyncio.Task] = None # the last "*" call
+
+    def submit(self, item):
+        if self.on_dispatch is not None:
+            self.on_dispatch() # now, not when the task gets to run: a submitted call can't be taken back
+        group = self.ordering.get(item.name, item.name)
+        if group == EXCLUSIVE:
+            after = list(self.tasks)
+        else:
+            after = [task for task in (self.exclusive, self.last_in_group.get(group)) if task is not None]
+        task = asyncio.create_task(self.dispatch(item, after))
+        self.tasks.append(task)
+        if group == EXCLUSIVE:
+            self.exclusive = task
+            self.last_in_group.clear() # everything after waits on it already
+        else:
+            self.last_in_group[group] = task
+
+    async def dispatch(self, item, after: List[asyncio.Task]):
+        if after:
+            await asyncio.wait(after)
+        return await ModelPurveyor.dispatch(item, self.tool_dispatcher)
+
+    async def results(self) -> list:
+        """
+        dispatch()'s tuple for each call, in submission order. No calls: the no-op tuple.
+        """
+        if not self.tasks:
+            return [await ModelPurveyor.dispatch(None, self.tool_dispatcher)]
+        try:
+            return list(await asyncio.gather(*self.tasks))
+        except BaseException:
+            for task in self.tasks:
+                task.cancel()
+            raise
+
 class ModelPurveyor:
     IDENTITY_MODEL_STRING = IDENTITY_MODEL_STRING
     SUMMARIZER_MODEL_STRING = SUMMARIZER_MODEL_STRING
     INTRODUCER_MODEL_STRING = INTRODUCER_MODEL_STRING
+    HEDGE_MODEL_STRING = HEDGE_MODEL_STRING
+    HEDGE_DELAY = HEDGE_DELAY
+    IDENTITY_MAX_ATTEMPTS = IDENTITY_MAX_ATTEMPTS
+    IDENTITY_RETRY_BACKOFF = IDENTITY_RETRY_BACKOFF
+    FALLBACK_TOOL = FALLBACK_TOOL
+    IDENTITY_STREAMING = IDENTITY_STREAMING
+    PARALLEL_TOOL_CALLS = PARALLEL_TOOL_CALLS
+    draining: set = set() # streams read to the end behind a dispatch
+
+    @staticmethod
+    def context_budget(model_string: Optional[str] = None) -> int:
+        """
+        CONTEXT_TOKEN_BUDGET in the env overrides the per-model budget. Defaults to the identity model's
+        """
+        model_string = model_string or ModelPurveyor.IDENTITY_MODEL_STRING
+        if os.environ.get("CONTEXT_TOKEN_BUDGET"):
+            return int(os.environ["CONTEXT_TOKEN_BUDGET"])
+        return CONTEXT_TOKEN_BUDGETS.get(model_string, DEFAULT_CONTEXT_TOKEN_BUDGET)
+
     @staticmethod
-    def identity(name: str, instructions: str, function_tools: List[dict]):
-        match IDENTITY_MODEL_STRING:
+    def identity(name: str, instructions: str, function_tools: List[dict], model_string: Optional[str] = None):
+        model_string = model_string or ModelPurveyor.IDENTITY_MODEL_STRING
+        match model_string:
             case "o4-mini":
-                return Model(
+                identity = Model(
                     name=name,
                     instructions=instructions,
                     tools=function_tools, # The tool-ified VLA Complexes
                     model="o4-mini"
                 )
             case "claude-sonnet-4-20250514":
-                return Model(
+                identity = Model(
                     name=name,
                     instructions=instructions,
                     tools=function_tools, # The tool-ified VLA Complexes
                     model=LitellmModel(model="anthropic/claude-sonnet-4-20250514")
                 )
             case "deepseek-chat":
-                return Model(
+                identity = Model(
                     name=name,
                     instructions=instructions,
                     tools=function_tools,
                     model=LitellmModel(model="deepseek/deepseek-chat")
                 )
+            case _: # Any other OpenAI model
+                identity = Model(
+                    name=name,
+                    instructions=instructions,
+                    tools=function_tools,
+                    model=model_string
+                )
+        identity.model_string = model_string
+        identity.parallel_tool_calls = ModelPurveyor.PARALLEL_TOOL_CALLS
+        return identity
         
 
     @staticmethod
-    async def run(identity, context, tool_dispatcher):
+    async def run(identity, context, tool_dispatcher, on_dispatch: Optional[Callable] = None, report: Optional[dict] = None):
+        """
+        Dispatches every function call the model makes, concurrently as far as TOOL_ORDERING allows,
+        each as soon as it's known. Returns dispatch()'s tuple for each, in the order they were called.
+        on_dispatch is called right before the first dispatch - past that point the run can't be taken back
+        """
+        dispatches = ToolCallDispatch(tool_dispatcher, on_dispatch)
+        try:
+            await ModelPurveyor.choose_calls(identity, context, tool_dispatcher, report, on_call=dispatches.submit)
+        except Exception as e:
+            if not dispatches.tasks:
+                raise
+            print(f"[ModelPurveyor] Response broke off after {len(dispatches.tasks)} calls were dispatched: {e}")
+        return await dispatches.results()
+
+    @staticmethod
+    async def choose(identity, context, tool_dispatcher: Optional[dict] = None, report: Optional[dict] = None):
+        """
+        The first of choose_calls(), or None
+        """
+        calls = await ModelPurveyor.choose_calls(identity, context, tool_dispatcher, report)
+        return calls[0] if calls else None
+
+    @staticmethod
+    async def choose_calls(identity, context, tool_dispatcher: Optional[dict] = None, report: Optional[dict] = None, on_call: Optional[Callable] = None) -> list:
+        """
+        Runs the model until it calls a function, at most IDENTITY_MAX_ATTEMPTS times. Returns its function_calls,
+        or when the attempts run out, a call to FALLBACK_TOOL (none if there isn't one).
+        With a tool_dispatcher, a call to an unknown tool or with unreadable arguments is dropped.
+        on_call, if given, gets each call as soon as it's complete (mid-stream when streaming).
+        report, if given, gets the attempts made, whether the fallback was used and the number of calls;
+        its "completed" is set only once the model answered with a call or the fallback was chosen.
+        """
+        report = {} if report is None else report
+        report["completed"] = False
+        message = None
+        for attempt in range(ModelPurveyor.IDENTITY_MAX_ATTEMPTS):
+            if attempt and ModelPurveyor.IDENTITY_RETRY_BACKOFF:
+                await asyncio.sleep(ModelPurveyor.IDENTITY_RETRY_BACKOFF * 2 ** (attempt - 1))
+            tool_choice = "required" if attempt else None
+            report["attempts"] = attempt + 1
+            if ModelPurveyor.IDENTITY_STREAMING and getattr(identity, "streams", False):
+                report["streamed"] = True
+                with tracing.span("model_request", model=getattr(identity, "model_string", None), attempt=attempt, streamed=True):
+                    calls, text = await ModelPurveyor.streamed_calls(identity, context, tool_choice, tool_dispatcher, on_call)
+            else:
+                with tracing.span("model_request", model=getattr(identity, "model_string", None), attempt=attempt):
+                    result = await identity.run(context, tool_choice=tool_choice)
+                metrics.record(getattr(result, "usage", None), getattr(identity, "model_string", None), "identity")
+                for i, item in enumerate(result.output):
+                    print(f"[ModelPurveyor] {i}. {item}")
+                calls = ModelPurveyor.usable_calls(result.output, tool_dispatcher)
+                text = ModelPurveyor.message_text(result)
+                for call in calls:
+                    if on_call is not None:
+                        on_call(call)
+            if calls:
+                report["fallback"] = False
+                report["calls"] = len(calls)
+                report["completed"] = True
+                return calls
+            message = text or message
+            print(f"[ModelPurveyor] No usable function call (attempt {attempt + 1} of {ModelPurveyor.IDENTITY_MAX_ATTEMPTS}).")
+        report["fallback"] = True
+        report["completed"] = True
+        call = ModelPurveyor.fallback_call(identity, tool_dispatcher, message)
+        if call is None:
+            report["calls"] = 0
+            return []
+        report["calls"] = 1
+        if on_call is not None:
+            on_call(call)
+        return [call]
+
+    @staticmethod
+    def usable_calls(output: list, tool_dispatcher: Optional[dict]) -> list:
+        calls = [item for item in output if item.type == "function_call"]
+        if not ModelPurveyor.PARALLEL_TOOL_CALLS:
+            calls = calls[:1]
+        return [call for call in calls if tool_dispatcher is None or ModelPurveyor.valid_call(call, tool_dispatcher)]
+
+    @staticmethod
+    async def streamed_calls(identity, context, tool_choice: Optional[str], tool_dispatcher: Optional[dict], on_call: Optional[Callable] = None):
+        """
+        Reads the stream, handing each usable function call to on_call the moment it's complete. Returns the
+        calls and the last message's text. Without PARALLEL_TOOL_CALLS it returns at the first call, and the
+        rest of the stream (trailing items, usage) is read behind the dispatch.
+        """
+        stream = identity.stream(context, tool_choice=tool_choice)
+        message = None
+        calls = []
+        i = 0
+        try:
+            async for event in stream:
+                if event.type == "response.completed":
+                    metrics.record(getattr(event.response, "usage", None), getattr(identity, "model_string", None), "identity")
+                if event.type != "response.output_item.done":
+                    continue
+                item = event.item
+                print(f"[ModelPurveyor] {i}. {item}")
+                i += 1
+                if item.type == "message":
+                    message = ModelPurveyor.item_text(item) or message
+                if item.type == "function_call" and (tool_dispatcher is None or ModelPurveyor.valid_call(item, tool_dispatcher)):
+                    calls.append(item)
+                    if on_call is not None:
+                        on_call(item)
+                    if not ModelPurveyor.PARALLEL_TOOL_CALLS:
+                        drain = asyncio.create_task(ModelPurveyor.drain(stream, identity))
+                        ModelPurveyor.draining.add(drain)
+                        drain.add_done_callback(ModelPurveyor.draining.discard)
+                        return calls, message
+        except BaseException:
+            await stream.aclose() # e.g. preempted, or lost a hedge: stop the response
+            raise
+        return calls, message
+
+    @staticmethod
+    async def drain(stream, identity):
+        try:
+            async for event in stream:
+                if event.type == "response.completed":
+                    metrics.record(getattr(event.response, "usage", None), getattr(identity, "model_string", None), "identity")
+        except Exception as e:
+            print(f"[ModelPurveyor] Stream ended badly after the dispatch: {e}")
+        finally:
+            await stream.aclose()
+
+    @staticmethod
+    def message_text(result) -> Optional[str]:
+        for item in result.output:
+            if item.type == "message":
+                text = ModelPurveyor.item_text(item)
+                if text:
+                    return text
+        return None
+
+    @staticmethod
+    def item_text(item) -> str:
+        return "".join(getattr(content, "text", "") or "" for content in item.content or [])
+
+    @staticmethod
+    def fallback_call(identity, tool_dispatcher: Optional[dict], message: Optional[str]) -> Optional[FallbackCall]:
+        """
+        FALLBACK_TOOL, with every required string parameter set to the model's last message.
+        None if it isn't offered right now or needs anything else.
+        """
+        name = ModelPurveyor.FALLBACK_TOOL
+        tool = next((tool for tool in getattr(identity, "tools", None) or [] if tool.get("name") == name), None)
+        if tool is None or (tool_dispatcher is not None and name not in tool_dispatcher):
+            return None
+        parameters = tool.get("parameters") or {}
+        arguments = {}
+        for parameter in parameters.get("required", []):
+            if parameters.get("properties", {}).get(parameter, {}).get("type") != "string":
+                return None
+            arguments[parameter] = message or ""
+        print(f"[ModelPurveyor] Falling back to {name}.")
+        return FallbackCall(name=name, arguments=json.dumps(arguments))
+
+    @staticmethod
+    def valid_call(item, tool_dispatcher: dict) -> bool:
+        if item.name not in tool_dispatcher:
+            return False
+        try:
+            return isinstance(json.loads(item.arguments), dict)
+        except (TypeError, ValueError):
+            return False
+
+    @staticmethod
+    async def dispatch(item, tool_dispatcher, on_dispatch: Optional[Callable] = None):
         tool_return = ""
-        tool_called = False
         minirerun = False
-        result = await identity.run(context)
-        for i, item in enumerate(result.output):
-            print(f"[ModelPurveyor] {i}. {item}")
-            if item.type == "message":
-                if not tool_called:
-                    return await ModelPurveyor.run(identity, context, tool_dispatcher)
-            if item.type == "function_call":
+        if item is None:
+            return "default_name", {}, tool_return, minirerun
+        if on_dispatch is not None:
+            on_dispatch()
+        with tracing.span("tool_dispatch", tool=item.name):
+            try:
+                tool_return = await tool_dispatcher[item.name](**json.loads(item.arguments))
+                if item.name in ("startgame", "endgame", "openchat"):
+                    minirerun = True
+            except Exception as e:
+                print(f"[ModelPurveyor] {e}! :()")
+        return item.name, json.loads(item.arguments), tool_return, minirerun
+
+    @staticmethod
+    async def hedged_run(identities: list, context, tool_dispatcher, hedge_delay: Optional[float] = None, on_dispatch: Optional[Callable] = None):
+        """
+        Races the identities (all but the first start after hedge_delay). The function calls of the first
+        to make any valid ones are dispatched and the others are cancelled. A FALLBACK_TOOL call doesn't
+        win: it's used only if no identity made a real call. Returns run()'s list and a
+        report of the race, keyed by role (see hedge_role()) since the models may be the same.
+        """
+        hedge_delay = ModelPurveyor.HEDGE_DELAY if hedge_delay is None else hedge_delay
+        t0 = time.time()
+        roles = [ModelPurveyor.hedge_role(i) for i in range(len(identities))]
+        report = {
+            "winner": None, "winner_model": None, "models": {role: identity.model_string for role, identity in zip(roles, identities)},
+            "latency": {}, "attempts": {}, "fallback": False, "calls": 0
+        }
+
+        async def attempt(role, identity, delay):
+            if delay > 0:
+                await asyncio.sleep(delay)
+            choice_report = {}
+            calls = await ModelPurveyor.choose_calls(identity, context, tool_dispatcher, choice_report)
+            report["latency"][role] = time.time() - t0
+            report["attempts"][role] = choice_report.get("attempts", 0)
+            return role, identity, calls, choice_report.get("fallback", False)
+
+        tasks = [
+            asyncio.create_task(attempt(role, identity, hedge_delay if i else 0))
+            for i, (role, identity) in enumerate(zip(roles, identities))
+        ]
+        calls = []
+        winner = None
+        fallback = None # the first racer to fall back, in case nobody makes a real call
+        try:
+            for next_done in asyncio.as_completed(tasks):
                 try:
-                    tool_return = await tool_dispatcher[item.name](**json.loads(item.arguments))
-                    if item.name in ("startgame", "endgame", "openchat"):
-                        minirerun = True
+                    role, identity, racer_calls, fell_back = await next_done
                 except Exception as e:
-                    print(f"[ModelPurveyor] {e}! :()")
-                return item.name, json.loads(item.arguments), tool_return, minirerun
-        return "default_name", {}, tool_return, minirerun
-                    
+                    print(f"[ModelPurveyor] Hedged identity failed: {e}")
+                    continue
+                if racer_calls and not fell_back:
+                    winner = (role, identity, racer_calls, False)
+                    break
+                if racer_calls and fallback is None:
+                    fallback = (role, identity, racer_calls, True)
+        finally:
+            for task in tasks:
+                task.cancel() # the losers
+        winner = winner or fallback
+        if winner is not None:
+            role, identity, calls, fell_back = winner
+            report["winner"] = role
+            report["winner_model"] = identity.model_string
+            report["fallback"] = fell_back
+            report["calls"] = len(calls)
+        dispatches = ToolCallDispatch(tool_dispatcher, on_dispatch)
+        for call in calls:
+            dispatches.submit(call)
+        return await dispatches.results(), report
+
+    @staticmethod
+    def hedge_role(i: int) -> str:
+        return "primary" if i == 0 else "hedge" if i == 1 else f"hedge {i}"
+
     @staticmethod
     def summarizer(name: str, instructions: str):
-        match SUMMARIZER_MODEL_STRING:
+        match ModelPurveyor.SUMMARIZER_MODEL_STRING:
             case "o4-mini":
                 return Agent(
                     name=name,
@@ -85,15 +429,15 @@ class ModelPurveyor:
             
     @staticmethod
     async def remember(identity, context):
-        match SUMMARIZER_MODEL_STRING:
+        match ModelPurveyor.SUMMARIZER_MODEL_STRING:
             case "o4-mini":
-                return await Runner.run(identity, context)
+                return await Runner.run(identity, context, run_config=clients.run_config())
             case "claude-sonnet-4-20250514":
-                return await Runner.run(identity, context)
+                return await Runner.run(identity, context, run_config=clients.run_config())
     
     @staticmethod
     def introducer(name: str, instructions: str):
-        match INTRODUCER_MODEL_STRING:
+        match ModelPurveyor.INTRODUCER_MODEL_STRING:
             case "o4-mini":
                 return Agent(
                     name=name,
@@ -109,8 +453,8 @@ class ModelPurveyor:
             
     @staticmethod
     async def introduce(identity, context):
-        match SUMMARIZER_MODEL_STRING:
+        match ModelPurveyor.SUMMARIZER_MODEL_STRING:
             case "o4-mini":
-                return await Runner.run(identity, context)
+                return await Runner.run(identity, context, run_config=clients.run_config())
             case "claude-sonnet-4-20250514":
-                return await Runner.run(identity, context)
\ No newline at end of file
+                return await Runner.run(identity, context, run_config=clients.run_config())
\ No newline at end of file
@@ -1,26 +1,32 @@
-from openai import AsyncOpenAI
-client = AsyncOpenAI()  # automatically uses OPENAI_API_KEY
+from typing import Optional
+from vla_star.tool_choice_models import clients
 
 """
 Implements run methods
 """
 
 class Model:
-    def __init__(self, name, instructions, tools, model):
+    def __init__(self, name, instructions, tools, model, parallel_tool_calls: bool = True):
         self.name = name
         self.instructions = instructions
         self.tools = tools
         self.model = model
+        self.parallel_tool_calls = parallel_tool_calls # several function calls in one response
 
-    async def run(self, input):
+    async def run(self, input, tool_choice: Optional[str] = None):
+        """
+        tool_choice="required" forces a function call
+        """
         # Detect provider style
         if isinstance(self.model, str):
             # OpenAI native
-            return await client.responses.create(
+            return await clients.async_client().responses.create(
                 model=self.model,
                 instructions=self.instructions,
                 input=input,
-                tools=self.tools
+                tools=self.tools,
+                parallel_tool_calls=self.parallel_tool_calls,
+                **({"tool_choice": tool_choice} if tool_choice else {})
             )
         else:
             # LiteLLM or other provider
@@ -32,5 +38,28 @@ class Model:
                     {"role": "user", "content": input},
                 ],
                 tools=self.tools,
-                tool_choice="required",  # may vary slightly by provider
-            )
\ No newline at end of file
+                tool_choice=tool_choice or "required",  # may vary slightly by provider
+                parallel_tool_calls=self.parallel_tool_calls,
+            )
+
+    @property
+    def streams(self) -> bool:
+        return isinstance(self.model, str)
+
+    async def stream(self, input, tool_choice: Optional[str] = None):
+        """
+        The Responses stream's events, as they arrive. OpenAI native models only.
+        Closing the generator closes the response.
+        """
+        stream = await clients.async_client().responses.create(
+            model=self.model,
+            instructions=self.instructions,
+            input=input,
+            tools=self.tools,
+            parallel_tool_calls=self.parallel_tool_calls,
+            stream=True,
+            **({"tool_choice": tool_choice} if tool_choice else {})
+        )
+        async with stream:
+            async for event in stream:
+                yield event
@@ -1,52 +1,220 @@
 from datetime import datetime
 from pathlib import Path
+from collections import deque
+from typing import List, Optional
+import atexit
+import contextlib
+import contextvars
 import os
 import csv
+import threading
+import time
 
 """
-Not really used, but could count the
+Token usage and cost, per agent. Every model call reports its usage here, tagged by caller
+(identity, summarizer, vlm, tts, stt, ...):
+
+    metrics.record(response.usage, "o4-mini", "vlm")
+
+It lands on the Profile of whichever agent is running (see attributed()), is appended to
+frozen/<name>/tokens.csv in batches, and is summed over a rolling window for summary().
 """
 
+# USD per million tokens, list prices. Models not listed are counted but cost nothing.
 MODEL_PRICING = {
+    "o4-mini": {
+        "input_per_million": 1.10,
+        "output_per_million": 4.40,
+    },
     "gpt-4o": {
-        "input_per_million": 5.00,
-        "output_per_million": 15.00,
+        "input_per_million": 2.50,
+        "output_per_million": 10.00,
+    },
+    "gpt-4o-mini": {
+        "input_per_million": 0.15,
+        "output_per_million": 0.60,
     },
     "gpt-4.1": {
-        "input_per_million": 10.00,
-        "output_per_million": 30.00,
+        "input_per_million": 2.00,
+        "output_per_million": 8.00,
+    },
+    "claude-sonnet-4-20250514": {
+        "input_per_million": 3.00,
+        "output_per_million": 15.00,
+    },
+    "deepseek-chat": {
+        "input_per_million": 0.27,
+        "output_per_million": 1.10,
+    },
+    "gpt-4o-mini-tts": {
+        "input_per_million": 0.60,
+        "output_per_million": 12.00,
+    },
+    "gpt-4o-transcribe": {
+        "input_per_million": 6.00,
+        "output_per_million": 10.00,
+    },
+    "gpt-4o-mini-transcribe": {
+        "input_per_million": 3.00,
+        "output_per_million": 5.00,
+    },
+    "text-embedding-3-small": {
+        "input_per_million": 0.02,
+        "output_per_million": 0.0,
     },
 }
 
 HEADERS = {
-    "tokens": "timestamp,input_tokens,output_tokens,total_tokens,model_name"
+    "tokens": ["timestamp", "input_tokens", "output_tokens", "total_tokens", "model_name", "caller", "cost"]
 }
 
+METRICS_FLUSH_EVERY = int(os.environ.get("METRICS_FLUSH_EVERY", 20))          # rows
+METRICS_FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", 30.0)) # seconds
+METRICS_WINDOW = float(os.environ.get("METRICS_WINDOW", 300.0))                # seconds, for summary()
+
+def cost(model_name: str, input_tokens: int, output_tokens: int) -> float:
+    pricing = MODEL_PRICING.get(model_name)
+    if pricing is None:
+        return 0.0
+    return (input_tokens * pricing["input_per_million"] + output_tokens * pricing["output_per_million"]) / 1e6
+
+def usage_tokens(usage) -> Optional[tuple[int, int]]:
+    """
+    (input, output) tokens from a Responses/Agents usage (input_tokens, output_tokens), a
+    chat completions usage (prompt_tokens, completion_tokens), or a dict of either
+    """
+    if usage is None:
+        return None
+    get = usage.get if isinstance(usage, dict) else lambda key: getattr(usage, key, None)
+    input_tokens = get("input_tokens")
+    output_tokens = get("output_tokens")
+    if input_tokens is None and output_tokens is None:
+        input_tokens = get("prompt_tokens")
+        output_tokens = get("completion_tokens")
+    if input_tokens is None and output_tokens is None:
+        return None
+    return int(input_tokens or 0), int(output_tokens or 0)
+
+
 class Profile:
-    def __init__(self, name):
+    def __init__(self, name, directory: Optional[Path] = None):
+        """
+        Writes to directory/tokens.csv, frozen/<name>/ by default
+        """
         self.name = name
-        self.model_usage_filename = f"frozen/{name}/tokens.csv"
+        self.directory = directory
+        self.model_usage_filename = str(Path(directory) / "tokens.csv") if directory is not None else f"frozen/{name}/tokens.csv"
+        self.rows: List[list] = []     # not yet flushed
+        self.last_flush = time.monotonic()
+        self.window: deque = deque()   # (monotonic time, caller, model, input, output, cost)
+        self.totals = {"calls": 0, "input_tokens": 0, "output_tokens": 0, "cost": 0.0}
+        self.counts: dict[str, int] = {} # events that aren't model calls, e.g. suppressed runs
+        self._lock = threading.Lock()
         self.init_file(self.model_usage_filename)
-    
+        profiles[name] = self
+
+    def __getstate__(self):
+        # Unflushed rows go to disk now; the window starts over in the restored process
+        self.flush()
+        return {"name": self.name, "directory": self.directory}
+
+    def __setstate__(self, state):
+        self.__init__(state["name"], state.get("directory"))
+
     def init_file(self, filename):
         os.makedirs(os.path.dirname(filename), exist_ok=True)
         file_type = Path(filename).stem
-        if not os.path.exists(filename):
-            with open(filename, "w", newline="") as f:
-                writer = csv.writer(f)
-                writer.writerow(HEADERS[file_type])
-
-    def add_model_usage(self, usage, model_name):
-        timestamp = datetime.now().isoformat()
-        with open(self.model_usage_filename, "a", newline="") as f:
+        header = ",".join(HEADERS[file_type])
+        if os.path.exists(filename):
+            with open(filename, "r") as f:
+                if f.readline().strip() == header:
+                    return
+            # Written by an older version: keep it aside
+            os.replace(filename, f"{filename}.{int(time.time())}.old")
+        with open(filename, "w", newline="") as f:
             writer = csv.writer(f)
-            writer.writerow([
-                timestamp,
-                usage.input_tokens,
-                usage.output_tokens,
-                usage.total_tokens,
-                model_name
+            writer.writerow(HEADERS[file_type])
+
+    def add_model_usage(self, usage, model_name, caller: str = "identity") -> Optional[float]:
+        """
+        Returns the call's cost, or None if usage had no token counts
+        """
+        tokens = usage_tokens(usage)
+        if tokens is None:
+            return None
+        input_tokens, output_tokens = tokens
+        call_cost = cost(model_name, input_tokens, output_tokens)
+        now = time.monotonic()
+        with self._lock:
+            self.rows.append([
+                datetime.now().isoformat(),
+                input_tokens,
+                output_tokens,
+                input_tokens + output_tokens,
+                model_name,
+                caller,
+                f"{call_cost:.6f}"
             ])
+            self.window.append((now, caller, model_name, input_tokens, output_tokens, call_cost))
+            self.totals["calls"] += 1
+            self.totals["input_tokens"] += input_tokens
+            self.totals["output_tokens"] += output_tokens
+            self.totals["cost"] += call_cost
+            due = len(self.rows) >= METRICS_FLUSH_EVERY or now - self.last_flush >= METRICS_FLUSH_INTERVAL
+        if due:
+            self.flush()
+        return call_cost
+
+    def count(self, event: str, n: int = 1):
+        with self._lock:
+            self.counts[event] = self.counts.get(event, 0) + n
+
+    def flush(self):
+        with self._lock:
+            rows, self.rows = self.rows, []
+            self.last_flush = time.monotonic()
+        if not rows:
+            return
+        with open(self.model_usage_filename, "a", newline="") as f:
+            csv.writer(f).writerows(rows)
+
+    def summary(self, window: float = METRICS_WINDOW) -> dict:
+        """
+        Calls, tokens and cost over the last window seconds (overall and per caller), plus lifetime totals and counts
+        """
+        now = time.monotonic()
+        with self._lock:
+            while self.window and now - self.window[0][0] > max(window, METRICS_WINDOW):
+                self.window.popleft()
+            recent = [entry for entry in self.window if now - entry[0] <= window]
+            totals = dict(self.totals)
+            counts = dict(self.counts)
+        minutes = window / 60
+
+        def rates(entries) -> dict:
+            input_tokens = sum(entry[3] for entry in entries)
+            output_tokens = sum(entry[4] for entry in entries)
+            spent = sum(entry[5] for entry in entries)
+            return {
+                "calls": len(entries),
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "cost": spent,
+                "tokens_per_min": (input_tokens + output_tokens) / minutes,
+                "cost_per_hour": spent * 60 / minutes,
+            }
+
+        by_caller = {}
+        for entry in recent:
+            by_caller.setdefault(entry[1], []).append(entry)
+        return {
+            "name": self.name,
+            "window_s": window,
+            **rates(recent),
+            "by_caller": {caller: rates(entries) for caller, entries in by_caller.items()},
+            "totals": totals,
+            "counts": counts,
+        }
 
     def plot_model_usage(self):
         """
@@ -86,3 +254,52 @@ class Profile:
         plt.xticks(rotation=45)
         plt.tight_layout()
         plt.show()
+
+
+profiles: dict[str, Profile] = {} # name -> the latest Profile by that name
+
+# The Profile of the agent whose work is running, for calls made deep inside tools (VLM, audio)
+_current: contextvars.ContextVar[Optional[Profile]] = contextvars.ContextVar("profile", default=None)
+
+@contextlib.contextmanager
+def attributed(profile: Profile):
+    """
+    Model calls made inside (and in tasks started inside) count toward profile
+    """
+    token = _current.set(profile)
+    try:
+        yield profile
+    finally:
+        _current.reset(token)
+
+def current() -> Profile:
+    profile = _current.get()
+    if profile is None:
+        # Calls outside any agent, e.g. the chat client's audio
+        profile = profiles.get("shared") or Profile("shared")
+    return profile
+
+def record(usage, model_name: str, caller: str, profile: Optional[Profile] = None) -> Optional[float]:
+    """
+    Never raises: a bad usage object shouldn't cost an identity run
+    """
+    if usage is None:
+        return None
+    try:
+        return (profile or current()).add_model_usage(usage, model_name, caller)
+    except Exception as e:
+        print(f"[Metrics] Could not record {caller} usage: {e}")
+        return None
+
+def estimate_tokens(text: str) -> int:
+    # For APIs that don't report usage (speech)
+    return max(1, len(text) // 4) if text else 0
+
+def summaries(window: float = METRICS_WINDOW) -> dict[str, dict]:
+    return {name: profile.summary(window) for name, profile in list(profiles.items())}
+
+def flush_all():
+    for profile in list(profiles.values()):
+        profile.flush()
+
+atexit.register(flush_all)
@@ -0,0 +1,154 @@
+import atexit
+import contextlib
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Optional
+
+"""
+Stimulus-to-action spans, exported as Chrome trace JSON (open in Perfetto or chrome://tracing).
+
+    TRACE=logs/trace.json python -m start_scripts.start Mike
+
+Each stimulus (a rerun) gets an id when it is raised. The spans that follow from it (queueing
+in the ThinkingMachine, waiting on the identity lock, summarization, context assembly, the
+model request, tool dispatch, chat send) carry that id, and show up on one track per stimulus.
+Off unless TRACE is set, in which case the spans cost next to nothing.
+"""
+
+TRACE = os.environ.get("TRACE") or None
+TRACE_PATH = "logs/trace.json" if TRACE == "1" else TRACE
+TRACE_MAX_EVENTS = int(os.environ.get("TRACE_MAX_EVENTS", 200000))
+
+_stimulus: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("stimulus", default=None)
+_stimulus_ids = itertools.count(1)
+
+def now_us() -> float:
+    return time.perf_counter_ns() / 1000
+
+def current_stimulus() -> Optional[int]:
+    return _stimulus.get()
+
+def set_stimulus(stimulus: Optional[int]) -> contextvars.Token:
+    return _stimulus.set(stimulus)
+
+def reset_stimulus(token: contextvars.Token):
+    _stimulus.reset(token)
+
+def next_stimulus(source: Any = None) -> Optional[int]:
+    """
+    A fresh stimulus id, None when tracing is off
+    """
+    if not tracer.enabled:
+        return None
+    stimulus = next(_stimulus_ids)
+    tracer.instant("stimulus", stimulus, source=str(source))
+    return stimulus
+
+@contextlib.contextmanager
+def stimulus(source: Any = None):
+    """
+    Raises a stimulus: it is current for whatever runs inside
+    """
+    token = set_stimulus(next_stimulus(source))
+    try:
+        yield current_stimulus()
+    finally:
+        reset_stimulus(token)
+
+
+class Span:
+    __slots__ = ("name", "stimulus", "args", "start")
+
+    def __init__(self, name: str, stimulus: Optional[int], args: dict):
+        self.name = name
+        self.stimulus = stimulus
+        self.args = args
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = now_us()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        tracer.record(self.name, self.start, now_us(), self.stimulus, **self.args)
+        return False
+
+class NoSpan:
+    args: dict = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+NO_SPAN = NoSpan()
+
+
+class Tracer:
+    def __init__(self, path: Optional[str] = TRACE_PATH, max_events: int = TRACE_MAX_EVENTS):
+        self.path = path
+        self.enabled = path is not None
+        self.events: deque = deque(maxlen=max_events)
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        if self.enabled:
+            atexit.register(self.export)
+
+    def span(self, name: str, stimulus: Optional[int] = None, **args) -> Span:
+        if not self.enabled:
+            return NO_SPAN
+        return Span(name, stimulus if stimulus is not None else current_stimulus(), args)
+
+    def record(self, name: str, start: float, end: float, stimulus: Optional[int] = None, **args):
+        """
+        A span with explicit start and end (µs, from now_us())
+        """
+        if not self.enabled:
+            return
+        stimulus = stimulus if stimulus is not None else current_stimulus()
+        base = {"name": name, "cat": "vla_star", "pid": self.pid, "args": {**args, "stimulus": stimulus}}
+        if stimulus is None:
+            # Not tied to a stimulus - a plain span on its thread
+            event = {**base, "ph": "X", "ts": start, "dur": end - start, "tid": threading.get_ident()}
+            with self._lock:
+                self.events.append(event)
+            return
+        with self._lock:
+            self.events.append({**base, "ph": "b", "ts": start, "id": stimulus, "tid": stimulus})
+            self.events.append({**base, "ph": "e", "ts": end, "id": stimulus, "tid": stimulus})
+
+    def instant(self, name: str, stimulus: Optional[int] = None, **args):
+        if not self.enabled:
+            return
+        stimulus = stimulus if stimulus is not None else current_stimulus()
+        with self._lock:
+            self.events.append({
+                "name": name, "cat": "vla_star", "ph": "n" if stimulus is not None else "i",
+                "ts": now_us(), "pid": self.pid, "tid": stimulus if stimulus is not None else threading.get_ident(),
+                "id": stimulus, "s": "t", "args": {**args, "stimulus": stimulus},
+            })
+
+    def export(self, path: Optional[str] = None) -> Optional[str]:
+        path = path or self.path
+        if path is None:
+            return None
+        with self._lock:
+            events = sorted(self.events, key=lambda event: event["ts"])
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        os.replace(path + ".tmp", path)
+        return path
+
+tracer = Tracer()
+
+def span(name: str, stimulus: Optional[int] = None, **args):
+    return tracer.span(name, stimulus, **args)
@@ -37,6 +37,9 @@ class Dataset:
             f.write(json.dumps(self.current_frame) + "\n")
         self.current_frame = None
 
+    def discard_frame(self):
+        self.current_frame = None
+
     def timestamp_frame(self):
         self.current_frame["timestamp"] = datetime.now(timezone.utc).isoformat()
 
@@ -54,11 +57,17 @@ class Dataset:
                         "role": "user",
                         "content": str(subframe)
                     })
+                    if subframe.sources is not None:
+                        # which tool each Session event came from, for replay
+                        self.current_frame["sources"] = subframe.sources
                 case str():  # instructions
                     self.current_frame["messages"].append({
                         "role": "system",
                         "content": subframe
                     })
+                case [ToolChoiceMade(), *_]:  # parallel tool calls
+                    tool_choices = [asdict(choice) for choice in subframe]
+                    self.current_frame["tool_choice_made"] = tool_choices[0] if len(tool_choices) == 1 else tool_choices
                 case list():  # tools
                     self.current_frame["tools"] = [
                         {
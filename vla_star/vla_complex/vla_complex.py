@@ -1,6 +1,6 @@
 from vla_star.vla_complex.vlm import VLM
 import time
-from typing import List, Any, Callable
+from typing import List, Any, Callable, Optional
 
 import os
 from datetime import datetime
@@ -10,12 +10,10 @@ import socket
 from vla_star.utilities.displays import log, timestamp, update_activity
 import queue
 from .vla_complex_state import State
+from vla_star.utilities import tracing
 
 from abc import abstractmethod
 
-runner: Callable = None
-agent_name: str = None
-
 class VLA_Complex:
     """
     Base class for all VLA_Complexes
@@ -25,6 +23,8 @@ class VLA_Complex:
     monitors: List
     recorded: bool
     is_available: bool
+    agent_runner: Optional[Callable] = None # class defaults, so older pickles still load
+    agent_name: Optional[str] = None
     def __init__(self, tool_name: str, on_start=False):      
         self.tool_name = tool_name
         self.on_start = on_start
@@ -38,13 +38,29 @@ class VLA_Complex:
     async def execute(self, *args, **kwargs):
         raise NotImplementedError()
 
+    def bind(self, agent_name: str, agent_runner: Optional[Callable] = None):
+        """
+        Ties the complex to its VLA_Star, so many agents can share a process
+        """
+        self.agent_name = agent_name
+        if agent_runner is not None:
+            self.agent_runner = agent_runner
+
+    def get_runner(self) -> Optional[Callable]:
+        return self.agent_runner
+
     def rerun_agent(self):
-        global runner
-        if runner:
-            runner(str(self))
+        agent_runner = self.get_runner()
+        if agent_runner:
+            with tracing.stimulus(self), tracing.span("rerun_agent", source=str(self)):
+                agent_runner(str(self))
         else:
             raise Exception("Why is there no runner function?")
         
     def agent_sleep(self):
-        global runner
-        runner("STOP")
\ No newline at end of file
+        self.get_runner()("STOP")
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("agent_runner", None) # belongs to a live event loop
+        return state
\ No newline at end of file
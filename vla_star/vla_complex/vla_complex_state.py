@@ -2,19 +2,237 @@ from typing import List, Optional, Any
 from dataclasses import dataclass
 from vla_star.utilities.displays import log, timestamp, update_activity
 import json
-from pydantic import BaseModel
+import time
+import itertools
+import threading
+from datetime import datetime
+from pydantic import BaseModel, ConfigDict, PrivateAttr, field_validator, field_serializer
 
 """
 All VLA Complexes have a state. This state can also be output from the Summarizer
 """
 
+TIMESTAMP_FORMAT = "[%Y-%m-%d %H:%M:%S]"
+
+_labels: List[str] = []
+_label_ids: dict[str, int] = {}
+_labels_lock = threading.Lock()
+_sequence = itertools.count()
+_session_lock = threading.Lock() # module level so States stay picklable
+
+def intern_label(label: str) -> int:
+    label_id = _label_ids.get(label)
+    if label_id is None:
+        with _labels_lock: # complexes add events from their own threads
+            label_id = _label_ids.get(label)
+            if label_id is None:
+                label_id = len(_labels)
+                _labels.append(label)
+                _label_ids[label] = label_id
+    return label_id
+
+
+class SessionEvent:
+    """
+    One event in a session. Renders to the old {"[timestamp] label": data} shape
+    for prompts, core.json and the Summarizer.
+    """
+    __slots__ = ("seq", "ns", "label_id", "data")
+
+    def __init__(self, label: str, data: Any, ns: Optional[int] = None, seq: Optional[int] = None):
+        self.seq = next(_sequence) if seq is None else seq
+        self.ns = time.time_ns() if ns is None else ns
+        self.label_id = intern_label(label)
+        self.data = data
+
+    @property
+    def label(self) -> str:
+        return _labels[self.label_id]
+
+    @property
+    def timestamp(self) -> str:
+        return datetime.fromtimestamp(self.ns / 1e9).strftime(TIMESTAMP_FORMAT)
+
+    @property
+    def key(self) -> str:
+        label = self.label
+        return f"{self.timestamp} {label}" if label else self.timestamp
+
+    def to_dict(self) -> dict[str, Any]:
+        return {self.key: self.data}
+
+    @classmethod
+    def from_key(cls, key: str, data: Any) -> "SessionEvent":
+        """
+        Migrates a legacy "[%Y-%m-%d %H:%M:%S] label" key (frozen memories, Summarizer output)
+        """
+        ns = None
+        label = key
+        if key.startswith("["):
+            stamp, _, rest = key.partition("]")
+            try:
+                ns = int(datetime.strptime(stamp + "]", TIMESTAMP_FORMAT).timestamp() * 1e9)
+                label = rest.strip()
+            except ValueError:
+                pass
+        return cls(label, data, ns=ns)
+
+    @classmethod
+    def from_dict(cls, item: dict[str, Any]) -> List["SessionEvent"]:
+        return [cls.from_key(key, data) for key, data in item.items()]
+
+    @staticmethod
+    def _restore(label, data, ns):
+        return SessionEvent(label, data, ns=ns)
+
+    def __reduce__(self):
+        # label ids and sequence numbers are per-process, so pickle the label and let
+        # the restored event take a fresh sequence number
+        return (SessionEvent._restore, (self.label, self.data, self.ns))
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+
+def render_session(session: List[Any]) -> List[dict[str, Any]]:
+    return [event.to_dict() if isinstance(event, SessionEvent) else event for event in session]
+
+
+class Impression(dict):
+    """
+    Impression dict that bumps its State's version when written to. Only top-level
+    writes are seen - replace nested values rather than mutating them.
+    """
+    __slots__ = ("state",)
+
+    def __init__(self, *args, state: Optional["State"] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.state = state
+
+    def _touch(self):
+        if self.state is not None:
+            self.state.touch()
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._touch()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._touch()
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._touch()
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self._touch()
+        return super().setdefault(key, default)
+
+    def pop(self, *args):
+        self._touch()
+        return super().pop(*args)
+
+    def popitem(self):
+        self._touch()
+        return super().popitem()
+
+    def clear(self):
+        super().clear()
+        self._touch()
+
+    def __reduce__(self):
+        return (Impression, (dict(self),), {"state": self.state})
+
+    def __setstate__(self, state):
+        self.state = state["state"]
+
+
 class State(BaseModel):
-    session: Optional[list[dict[str, str]]] = None
+    model_config = ConfigDict(arbitrary_types_allowed=True, validate_assignment=True)
+
+    session: Optional[list[SessionEvent]] = None
     impression: Optional[Any] = None
 
+    _version: int = PrivateAttr(default=0)
+    _json: Optional[tuple[int, str]] = PrivateAttr(default=None)
+
+    def model_post_init(self, __context):
+        if type(self.impression) is dict:
+            self.impression = self.impression
+
+    def __setattr__(self, name, value):
+        if name == "impression" and type(value) is dict:
+            value = Impression(value, state=self)
+        super().__setattr__(name, value)
+        if name in ("session", "impression"):
+            self.touch()
+
+    @property
+    def version(self) -> int:
+        """
+        Goes up on every change to the session or the (top level of the) impression
+        """
+        return self._version
+
+    def touch(self):
+        self._version += 1
+
+    @field_validator("session", mode="before")
+    @classmethod
+    def migrate_session(cls, session):
+        """
+        Accepts old-style sessions ([{"[timestamp] label": data}, ...]) from frozen memories
+        """
+        if session is None:
+            return None
+        events = []
+        for item in session:
+            if isinstance(item, SessionEvent):
+                events.append(item)
+            elif isinstance(item, dict):
+                events.extend(SessionEvent.from_dict(item))
+            else:
+                raise ValueError(f"Cannot read session event {item!r}")
+        return events
+
+    @field_serializer("session")
+    def serialize_session(self, session):
+        if session is None:
+            return None
+        return render_session(session)
+
     def add_to_session(self, event_label: str, event_data: str):
-        session_event = {f"{timestamp()} {event_label}": event_data}
-        self.session.append(session_event)
+        with _session_lock:
+            self.session.append(SessionEvent(event_label, event_data))
+        self.touch()
+
+    def extend_session(self, events: List[SessionEvent]):
+        """
+        Appends already built events (e.g. replayed ones, keeping their timestamps).
+        """
+        if not events:
+            return
+        with _session_lock:
+            self.session.extend(events)
+        self.touch()
+
+    def swap_session_prefix(self, source: list, length: int, replacement: list) -> bool:
+        """
+        Replaces the first `length` events of `source` with `replacement`, keeping any
+        events appended since. Does nothing if the session was replaced in the meantime.
+        """
+        with _session_lock:
+            if self.session is not source:
+                return False
+            self.session = list(replacement) + source[length:]
+        return True
+
+    def to_json(self) -> str:
+        if self._json is None or self._json[0] != self._version:
+            self._json = (self._version, json.dumps(self.model_dump(mode="json")))
+        return self._json[1]
 
     @staticmethod
     def form_map_from_vlac_name_to_vlac_state(vlacs) -> dict[str, "State"]:
@@ -22,9 +240,10 @@ class State(BaseModel):
         for vlac in vlacs:
             d[vlac.tool_name] = vlac.state
         return d
-    
+
     @staticmethod
     def states_to_json(obj: dict[str, "State"]) -> str:
-        return json.dumps(
-            {k: v.model_dump(mode="json") for k, v in obj.items()}
-        )
+        # Same output as json.dumps over the whole map, but unchanged states reuse their JSON
+        return "{" + ", ".join(
+            f"{json.dumps(k)}: {v.to_json()}" for k, v in obj.items()
+        ) + "}"
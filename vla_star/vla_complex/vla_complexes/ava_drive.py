@@ -101,7 +101,7 @@ class AvaDrive(VLA_Complex):
             }
         rerun_input["Current drive status"] = raison
         log(f"{self.tool_name} >>> LLM: {rerun_input}", self)
-        self.state.session.append({f"{timestamp()} Status":f"{raison}"})
+        self.state.add_to_session("Status", f"{raison}")
 
         self.rerun_agent()
 
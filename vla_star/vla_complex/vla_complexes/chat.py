@@ -4,6 +4,7 @@ from ..vla_complex import VLA_Complex
 from ..vla_complex_state import State
 from ..general_dataset import SubDataset
 from vla_star.utilities.displays import timestamp
+from vla_star.utilities import tracing
 import time
 import os
 import queue
@@ -67,7 +68,8 @@ class Chat(VLA_Complex):
         """
         print(f"[Chat] Sending \"{text}\"")
         try:
-            self.interface.add_to_conversation(text)
+            with tracing.span("chat_send"):
+                self.interface.add_to_conversation(text)
             self.state.add_to_session(self.interface.conversation.interlocutor, text)
             return "Message sent. Return immediately."
         except Exception as e:
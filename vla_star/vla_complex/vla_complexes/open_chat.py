@@ -44,7 +44,11 @@ class OpenChat(VLA_Complex):
         Open up a new conversation with another agent. This will end your current conversation.
         :param text: the name of the agent you want to converse with. (required)
         """
-        chat = VLA_Star.get_activated_vla_star().get_chat_vla_complex()
+        try:
+            chat = VLA_Star.get_vla_star_by_name(self.agent_name).get_chat_vla_complex()
+        except KeyError as e:
+            print(f"[OpenChat] {e}")
+            return "Couldn't find your own chat to open a conversation with."
         user, host = LocalNetworkManager.get_host_and_user_of_name(name)
         chat.interface.open_new_convo(name, host, user)
         chat.start_respond_thread()
@@ -1,7 +1,7 @@
-from openai import OpenAI
-client = OpenAI()
+from vla_star.tool_choice_models import clients
 import asyncio
 from pathlib import Path
+import vla_star.utilities.metrics as metrics
 
 USE_UNITY = False
 if USE_UNITY:
@@ -37,7 +37,7 @@ class VLM:
         except Exception:
             raise Exception("No latest image found")
         print("Sending completion...")
-        response = client.chat.completions.create(
+        response = clients.sync_client().chat.completions.create(
             model=MODEL,
             messages=[{
                 "role": "system",
@@ -58,6 +58,7 @@ class VLM:
                 ],
             }],
         )
+        metrics.record(response.usage, MODEL, "vlm")
         status = response.choices[0].message.content
         print(f"{prompt}: {status}")
         return status
@@ -68,32 +69,29 @@ class VLM:
         except Exception:
             raise Exception("No latest image found")
 
-        def blocking_request():
-            response = client.chat.completions.create(
-                model=MODEL,
-                messages=[
-                    {"role": "system",
+        response = await clients.async_client().chat.completions.create(
+            model=MODEL,
+            messages=[
+                {"role": "system",
+                "content": [
+                    {"type": "text", "text": self.system_prompt}
+                    ]
+                },
+                {
+                    "role": "user",
                     "content": [
-                        {"type": "text", "text": self.system_prompt}
-                        ]
-                    },
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": data_url
-                                }
-                            },
-                        ],
-                    },
-                ],
-            )
-            return response
-
-        response = await asyncio.to_thread(blocking_request)
+                        {"type": "text", "text": prompt},
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": data_url
+                            }
+                        },
+                    ],
+                },
+            ],
+        )
+        metrics.record(response.usage, MODEL, "vlm")
         return response.choices[0].message.content
     
     async def recommendation(self, prompt):
@@ -102,30 +100,27 @@ class VLM:
         except Exception:
             raise Exception("No latest image found")
 
-        def blocking_request():
-            response = client.chat.completions.create(
-                model=MODEL,
-                messages=[
-                    {"role": "system",
+        response = await clients.async_client().chat.completions.create(
+            model=MODEL,
+            messages=[
+                {"role": "system",
+                "content": [
+                    {"type": "text", "text": self.recommendation_system_prompt}
+                    ]
+                },
+                {
+                    "role": "user",
                     "content": [
-                        {"type": "text", "text": self.recommendation_system_prompt}
-                        ]
-                    },
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": data_url
-                                }
-                            },
-                        ],
-                    },
-                ],
-            )
-            return response
-
-        response = await asyncio.to_thread(blocking_request)
+                        {"type": "text", "text": prompt},
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": data_url
+                            }
+                        },
+                    ],
+                },
+            ],
+        )
+        metrics.record(response.usage, MODEL, "vlm")
         return response.choices[0].message.content
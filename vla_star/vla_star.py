@@ -4,22 +4,22 @@ import sys
 import weakref
 from vla_star.context_engine.context_engine import OrderedContextEngine,OrderedContextLLMEngine
 from vla_star.vla_complex.vla_complex import VLA_Complex
-import vla_star.vla_complex.vla_complex as vla_complex_module
 from vla_star.context_engine.runner import ThinkingMachine
 import os
 from vla_star.utilities.extension import Extension
 from vla_star.tool_choice_models.tool import Tool
 from vla_star.vla_complex.vla_complexes.chat import Chat
-class OneVLA_StarPerProcess(Exception):
-    pass
 
 class VLA_Star:
     """
-    Central class representing the agent
+    Central class representing the agent. Several can share a process (see VLA_StarRuntime);
+    each binds its complexes to its own runner.
     """
     name: str
     context_engine: OrderedContextEngine
     vla_complexes: List[VLA_Complex]
+    runner: Optional[Callable] = None
+    thinking_machine: Optional[ThinkingMachine] = None
 
     _activated = weakref.WeakSet()
 
@@ -34,10 +34,9 @@ class VLA_Star:
         self.tools = tools
         self.extension = extension
         self.context_engine.attach_tools(self.tools)
-        vla_complex_module.agent_name = self.name # idk why i need this
+        for tool in self.tools:
+            tool.vla_complex.bind(self.name)
 
-        if len(VLA_Star._activated) > 0:
-            raise OneVLA_StarPerProcess("There is already a VLA_Star instantiated in this python process. :(")
         type(self)._activated.add(self)
 
     @classmethod
@@ -48,6 +47,16 @@ class VLA_Star:
     @classmethod
     def get_activated_vla_star(cls) -> "VLA_Star":
         return VLA_Star.get_all_instances()[0]
+
+    @classmethod
+    def get_vla_star_by_name(cls, name: Optional[str]) -> "VLA_Star":
+        """
+        Raises KeyError if no live VLA_Star has that name: with several agents in the process, any other would be the wrong one
+        """
+        for vla_star in cls.get_all_instances():
+            if vla_star.name == name:
+                return vla_star
+        raise KeyError(f"No VLA_Star named {name!r} in this process")
         
     def safe_start(self):
         print(f"[VLA_Star] Safe start on process {os.getpid()}.")
@@ -58,16 +67,23 @@ class VLA_Star:
             pass
 
     def start(self, prompt: str | None = None):
+        asyncio.run(self.joint_start(self.vlacs_to_start()))
+
+    def vlacs_to_start(self) -> List[VLA_Complex]:
         vlacs_to_start = []
         for tool in self.tools:
             if hasattr(tool.vla_complex, "start") and tool.vla_complex.on_start:
                 vlacs_to_start.append(tool.vla_complex)
-        
-        asyncio.run(self.joint_start(vlacs_to_start))
+        return vlacs_to_start
+
+    def bind_runner(self):
+        self.runner = self.get_runner()
+        for tool in self.tools:
+            tool.vla_complex.bind(self.name, self.runner)
+        #print(f"Set runner of {self.name}: {self.runner.__name__}")
 
     async def joint_start(self, vlacs: List[VLA_Complex]):
-        vla_complex_module.runner = self.get_runner()
-        #print(f"Set vla_complex.runner: {vla_complex_module.runner.__name__}")
+        self.bind_runner()
 
         for vlac in vlacs:
             await vlac.start()
@@ -77,7 +93,7 @@ class VLA_Star:
     async def start_vlac(self, vlac: VLA_Complex):
         # start the "scheduler"
         
-        vla_complex_module.runner = self.get_runner()
+        self.bind_runner()
         await vlac.start()
 
         # keep main loop alive
@@ -88,6 +104,7 @@ class VLA_Star:
         if type(self.context_engine) == OrderedContextLLMEngine:
             #print("Starting GDA")
             tm = ThinkingMachine(self.context_engine)
+            self.thinking_machine = tm
             rerun_function = tm.rerun
             #print("Creating task...")
             asyncio.create_task(tm.start())
@@ -98,8 +115,46 @@ class VLA_Star:
             #print(f"Runner = {rerun_function}")
         return rerun_function
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("runner", None) # belongs to a live event loop
+        state.pop("thinking_machine", None)
+        return state
+
     def get_chat_vla_complex(self) -> VLA_Complex:
         for tool in self.tools:
             if type(tool.vla_complex) is Chat:
                 return tool.vla_complex
-        raise ValueError(f"[VLA*] Missing chat complex! {self.tools}")
\ No newline at end of file
+        raise ValueError(f"[VLA*] Missing chat complex! {self.tools}")
+
+
+class VLA_StarRuntime:
+    """
+    Hosts many VLA_Stars on one event loop. They share the process' imports and HTTP client
+    pool; each keeps its own context engine and ThinkingMachine.
+    """
+    vla_stars: List[VLA_Star]
+
+    def __init__(self, vla_stars: Optional[List[VLA_Star]] = None):
+        self.vla_stars = []
+        for vla_star in vla_stars or []:
+            self.add(vla_star)
+
+    def add(self, vla_star: VLA_Star):
+        if any(other.name == vla_star.name for other in self.vla_stars):
+            raise ValueError(f"[VLA_StarRuntime] There is already a VLA* named {vla_star.name}.")
+        self.vla_stars.append(vla_star)
+
+    def safe_start(self):
+        print(f"[VLA_StarRuntime] Starting {len(self.vla_stars)} VLA*s on process {os.getpid()}.")
+        try:
+            asyncio.run(self.joint_start())
+        except KeyboardInterrupt as k:
+            print("[VLA_StarRuntime] Safe start receives KeyboardInterrupt.")
+            pass
+
+    async def joint_start(self):
+        await asyncio.gather(*(
+            vla_star.joint_start(vla_star.vlacs_to_start())
+            for vla_star in self.vla_stars
+        ))